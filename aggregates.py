@@ -0,0 +1,130 @@
+import math
+from typing import Dict, List, Optional, Sequence
+
+from normalize import STAT_FIELDS, display_value
+from player_store import COLUMNS
+
+
+DEFAULT_TOP = 10
+MAX_TOP = 100
+# numeric columns the aggregates cover; birthdate is left out, age already says it
+NUMERIC_FIELDS = ("height_cm", "weight_kg", "age", *STAT_FIELDS)
+# distribution bin width per field
+BIN_WIDTHS = {"age": 1, "height_cm": 5, "weight_kg": 5}
+
+
+def _summary(values: List[float]) -> Dict:
+    ordered = sorted(values)
+    count = len(ordered)
+    median = ordered[count // 2] if count % 2 else (ordered[count // 2 - 1] + ordered[count // 2]) / 2
+    return {
+        "count": count,
+        "mean": round(sum(ordered) / count, 2),
+        "min": round(ordered[0], 2),
+        "median": round(median, 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def _distribution(values: List[float], width: float) -> List[Dict]:
+    counts: Dict[float, int] = {}
+    for value in values:
+        start = math.floor(value / width) * width
+        counts[start] = counts.get(start, 0) + 1
+    return [{"from": start, "to": start + width, "count": counts[start]} for start in sorted(counts)]
+
+
+class SourceAggregates:
+    """
+    Summaries, distributions, leaderboards and per-group averages for one source,
+    computed once from its snapshot's numeric columns when the snapshot is loaded
+    (so a scrape only recomputes its own source) and then answered from memory.
+    """
+
+    def __init__(self, source: str, players: Sequence, group_fields: Dict[str, str] = None):
+        self.source = source
+        self.count = len(players)
+
+        columns = {}
+        if hasattr(players, "column"):
+            columns = {field: players.column(field) for field in NUMERIC_FIELDS if len(players.column(field))}
+        self.fields = tuple(columns)
+        present = {field: [value for value in column if not math.isnan(value)] for field, column in columns.items()}
+
+        self.summaries = {field: _summary(values) for field, values in present.items() if values}
+        self.distributions = {
+            field: _distribution(present[field], width)
+            for field, width in BIN_WIDTHS.items() if present.get(field)
+        }
+        # leaderboards come straight from the snapshot's precomputed descending orders
+        self.leaders = {
+            field: [row for row in players.sort_order(field)[1][:MAX_TOP] if not math.isnan(columns[field][row])]
+            for field in self.summaries
+        }
+        self._columns = columns
+
+        # one pass over the records for the leaderboard names and the group keys
+        group_fields = group_fields or {}
+        name_key = COLUMNS.get(source, {}).get("name")
+        self.names: List[str] = []
+        rows_by_value: Dict[str, Dict[str, List[int]]] = {group: {} for group in group_fields}
+        for row, player in enumerate(players):
+            self.names.append(" ".join(str(player.get(name_key) or "").split()))
+            for group, key in group_fields.items():
+                value = " ".join(str(player.get(key) or "").split())
+                if value:
+                    rows_by_value[group].setdefault(value, []).append(row)
+        self.groups = {
+            group: sorted(
+                (self._group_summary(value, rows) for value, rows in values.items()),
+                key=lambda summary: (-summary["players"], summary["name"].lower()),
+            )
+            for group, values in rows_by_value.items()
+        }
+
+
+    def _group_summary(self, value: str, rows: List[int]) -> Dict:
+        averages = {}
+        for field, column in self._columns.items():
+            values = [column[row] for row in rows if not math.isnan(column[row])]
+            if values:
+                averages[field] = round(sum(values) / len(values), 2)
+        return {"name": value, "players": len(rows), "averages": averages}
+
+
+    def stats(self) -> Dict:
+        return {
+            "source": self.source,
+            "players": self.count,
+            "fields": self.summaries,
+            "distributions": self.distributions,
+            "groups": list(self.groups),
+        }
+
+
+    def leaderboard(self, field: str, limit: int = DEFAULT_TOP) -> Optional[List[Dict]]:
+        """
+        Top `limit` players by `field`, highest first; None if the source has no such column.
+        """
+        if field not in self.leaders:
+            return None
+        limit = min(max(1, limit), MAX_TOP)
+        column = self._columns[field]
+        return [
+            {"rank": rank, "row": row, "name": self.names[row],
+             "value": display_value(field, column[row])}
+            for rank, row in enumerate(self.leaders[field][:limit], start=1)
+        ]
+
+
+    def group_averages(self, group: str, sort: str = None, min_players: int = 1) -> Optional[List[Dict]]:
+        """
+        Per-group player counts and column averages, largest groups first or by
+        `sort` (a numeric field, highest average first). None if there is no such group.
+        """
+        if group not in self.groups:
+            return None
+        summaries = [summary for summary in self.groups[group] if summary["players"] >= min_players]
+        if sort in self.fields:
+            summaries = sorted(summaries, key=lambda summary: -summary["averages"].get(sort, -math.inf))
+        return summaries
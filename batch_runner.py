@@ -0,0 +1,150 @@
+"""
+Run many (source, country) scrapes as one crawl.
+
+    python batch_runner.py allrugby:united-states rugbypass:usa "worldathletics:United States"
+    python batch_runner.py --jobs jobs.json --resume
+
+`jobs.json` is a list of {"source": ..., "country": ...} objects. All jobs share one
+request scheduler, one retry policy, one HTTP connection pool, one parse worker pool
+and one browser pool, and each job writes to logs_<source>/<country>/. With --resume, jobs reuse their
+saved URL lists and only fetch profiles that are missing or failed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import List
+
+import aiohttp
+from decouple import config
+
+from browser_pool import BrowserPool
+from fetch_scheduler import FetchScheduler
+from http_client import client_session, connection_stats
+from parse_pool import ParsePool
+from retry_policy import RetryPolicy
+from scraping_allrugby import AllRugbyScraper
+from scraping_rugbypass import RugbyPassScrapper
+from scraping_worldathletics import WorldAthleticsScrapper, country_slug
+
+
+# how many jobs discover / fetch at the same time; requests are still capped by the scheduler
+BATCH_CONCURRENT_JOBS = config("BATCH_CONCURRENT_JOBS", default=4, cast=int)
+
+SCRAPERS = {
+    "allrugby": AllRugbyScraper,
+    "rugbypass": RugbyPassScrapper,
+    "worldathletics": WorldAthleticsScrapper,
+}
+
+
+class Job:
+
+    def __init__(self, source: str, country: str):
+        if source not in SCRAPERS:
+            raise ValueError(f"Unknown source {source!r}, expected one of {', '.join(SCRAPERS)}")
+        self.source = source
+        self.country = country
+        self.output_dir = os.path.join(f"logs_{source}", country_slug(country))
+
+        self.players = 0
+        self.seconds = 0.0
+        self.error = None
+
+
+    @property
+    def label(self) -> str:
+        return f"{self.source}:{self.country}"
+
+
+    @property
+    def profiles_per_second(self) -> float:
+        return self.players / self.seconds if self.seconds else 0.0
+
+
+def parse_jobs(specs: List[str], jobs_file: str = None) -> List[Job]:
+    jobs = []
+    if jobs_file:
+        with open(jobs_file, "r", encoding="utf-8") as f:
+            jobs.extend(Job(item["source"], item["country"]) for item in json.load(f))
+    for spec in specs:
+        source, sep, country = spec.partition(":")
+        if not sep or not country:
+            raise ValueError(f"Expected source:country, got {spec!r}")
+        jobs.append(Job(source, country))
+    return jobs
+
+
+async def run_job(job: Job, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                  scheduler: FetchScheduler, parse_pool: ParsePool, browser_pool: BrowserPool,
+                  retry_policy: RetryPolicy, resume: bool = False):
+    async with semaphore:
+        os.makedirs(job.output_dir, exist_ok=True)
+        scraper = SCRAPERS[job.source](
+            job.country,
+            url_log_path=os.path.join(job.output_dir, "player_profile_urls.json"),
+            data_log_path=os.path.join(job.output_dir, "player_data.json"),
+            scheduler=scheduler,
+            parse_pool=parse_pool,
+            browser_pool=browser_pool,
+            retry_policy=retry_policy,
+        )
+        print(f"[{job.label}] starting")
+        start = time.time()
+        try:
+            job.players = await scraper.run_in_app(session, resume)
+        except Exception as e:
+            job.error = e
+            print(f"[{job.label}] failed: {e}")
+        job.seconds = time.time() - start
+
+
+def print_report(jobs: List[Job], seconds: float):
+    print(f"\n{'job':<40} {'players':>8} {'seconds':>9} {'profiles/s':>11}")
+    for job in jobs:
+        status = f"  failed: {job.error}" if job.error else ""
+        print(f"{job.label:<40} {job.players:>8} {job.seconds:>9.2f} {job.profiles_per_second:>11.2f}{status}")
+    total = sum(job.players for job in jobs)
+    print(f"{'total':<40} {total:>8} {seconds:>9.2f} {total / seconds if seconds else 0.0:>11.2f}")
+
+
+async def run_batch(jobs: List[Job], concurrent_jobs: int = None, resume: bool = False):
+    scheduler = FetchScheduler()
+    # one circuit breaker per host across all jobs, like the scheduler's rate limits
+    retry_policy = RetryPolicy()
+    parse_pool = ParsePool()
+    browser_pool = BrowserPool()
+    semaphore = asyncio.Semaphore(concurrent_jobs or BATCH_CONCURRENT_JOBS)
+
+    start = time.time()
+    try:
+        # one connection pool for the whole crawl, sized to what the scheduler lets through
+        async with client_session(scheduler.max_in_flight) as session:
+            await asyncio.gather(*[
+                run_job(job, session, semaphore, scheduler, parse_pool, browser_pool, retry_policy, resume)
+                for job in jobs
+            ])
+    finally:
+        parse_pool.shutdown()
+        browser_pool.close()
+    print_report(jobs, time.time() - start)
+    print(connection_stats.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape several sources / countries in one run.")
+    parser.add_argument("jobs", nargs="*", help="source:country, e.g. allrugby:united-states")
+    parser.add_argument("--jobs", dest="jobs_file", help="JSON file with a list of {source, country} jobs")
+    parser.add_argument("--concurrent-jobs", type=int, help=f"default {BATCH_CONCURRENT_JOBS}")
+    parser.add_argument("--resume", action="store_true", help="only fetch profiles missing or failed in the last run")
+    args = parser.parse_args()
+
+    jobs = parse_jobs(args.jobs, args.jobs_file)
+    if not jobs:
+        parser.error("no jobs given")
+    asyncio.run(run_batch(jobs, args.concurrent_jobs, args.resume))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-profile parse time of every scraper across the HTML parser backends.
+
+    python -m benchmarks.bench_parsers [--repeat 200]
+
+Runs each scraper's parse_profile_html on the saved fixture pages in
+benchmarks/fixtures/<source>/profile.html, once parsing the whole page and once
+restricted to the scraper's PROFILE_TARGETS.
+"""
+import argparse
+import time
+from pathlib import Path
+from unittest import mock
+
+# only the module-level parse functions are used, so no scraper settings are needed
+import html_parser
+import scraping_allrugby
+import scraping_rugbypass
+import scraping_worldathletics
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+SOURCES = {
+    "allrugby": scraping_allrugby,
+    "rugbypass": scraping_rugbypass,
+    "worldathletics": scraping_worldathletics,
+}
+
+
+def time_parse(module, html: str, backend: str, repeat: int, full_page: bool):
+    """
+    Average milliseconds per parse_profile_html call, and the parsed record.
+    """
+    targets = None if full_page else module.PROFILE_TARGETS
+    with mock.patch.object(module, "PROFILE_TARGETS", targets):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = module.parse_profile_html(html, backend)
+        elapsed = time.perf_counter() - start
+    return elapsed / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    backends = [backend for backend in html_parser.BACKENDS if html_parser.resolve_backend(backend) == backend]
+
+    print(f"{'source':<16}{'backend':<14}{'full page ms':>14}{'targets ms':>14}{'speedup':>10}")
+    for source, module in SOURCES.items():
+        html = (FIXTURES_DIR / source / "profile.html").read_text(encoding="utf-8")
+        baseline, expected = None, None
+        for backend in backends:
+            full_ms, full_result = time_parse(module, html, backend, args.repeat, full_page=True)
+            targets_ms, targets_result = time_parse(module, html, backend, args.repeat, full_page=False)
+            baseline = baseline or full_ms
+            expected = expected or full_result
+            if full_result != expected or targets_result != expected:
+                raise AssertionError(f"{source}/{backend} parsed a different record: {targets_result}")
+            print(f"{source:<16}{backend:<14}{full_ms:>14.3f}{targets_ms:>14.3f}{baseline / targets_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
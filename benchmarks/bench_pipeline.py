@@ -0,0 +1,340 @@
+"""
+Discovery and profile-fetch throughput of every scraper, against a local stand-in
+for the real sites.
+
+    python -m benchmarks.bench_pipeline [--players 500] [--latency-ms 50] [--jitter-ms 20]
+                                        [--error-rate 0.02] [--rate-429 0.01] [--sources allrugby ...]
+                                        [--json results.json] [--baseline results.json]
+
+A fixture server (its own process, so it doesn't compete with the scrapers for the
+event loop) serves the recorded pages in benchmarks/fixtures/<source>/, with the
+configured latency, share of 500s and share of 429s (with Retry-After). Each source's
+HTTP discovery runs against its roster page, the roster is then repeated up to
+--players distinct profile URLs, and fetch_all_profiles fetches them all.
+
+Reports profiles/s, p50/p99 request latency as the client saw it, parse time per page
+(measured in the parse workers) and peak RSS of this process and of the parse workers.
+With --baseline, exits with status 1 if any source's profiles/s fell more than
+--tolerance below the baseline's.
+
+Every source is served from 127.0.0.1, so under the production per-host rate limit
+(REQUESTS_PER_SECOND_PER_HOST) they would all report that rate whatever the pipeline
+does. The per-host rate is therefore unthrottled by default; pass --rate to measure
+with a limit.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# scrapers read their base URLs when they are created, but the scheduler and retry policy
+# read their settings at import, so point everything at the fixture server first
+PORT = int(os.environ.get("BENCH_PORT") or _free_port())
+SERVER_URL = f"http://127.0.0.1:{PORT}"
+os.environ.update({
+    "ALLRUGBY_BASE_URL": f"{SERVER_URL}/allrugby",
+    "RUGBYPASS_BASE_URL": f"{SERVER_URL}/rugbypass",
+    "WORLDATHLETICS_BASE_URL": f"{SERVER_URL}/worldathletics",
+    "WORLDATHLETICS_GRAPHQL_URL": f"{SERVER_URL}/worldathletics/graphql",
+    "DISCOVERY_MODE": "http",
+})
+os.environ.setdefault("RETRY_LIMIT", "3")
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+import scraping_allrugby  # noqa: E402
+import scraping_rugbypass  # noqa: E402
+import scraping_worldathletics  # noqa: E402
+from fetch_scheduler import FetchScheduler  # noqa: E402
+from http_client import client_session  # noqa: E402
+from parse_pool import ParsePool  # noqa: E402
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+# per-host rate so high the token bucket never waits; the in-flight limit still applies
+UNTHROTTLED_RATE = 100_000.0
+
+# source -> (module, scraper class, country argument, roster path on the fixture server, relative URL field)
+SOURCES = {
+    "allrugby": (scraping_allrugby, scraping_allrugby.AllRugbyScraper, "united-states", "/allrugby/players/", "href"),
+    "rugbypass": (scraping_rugbypass, scraping_rugbypass.RugbyPassScrapper, "usa", "/rugbypass/teams/", "url"),
+    "worldathletics": (scraping_worldathletics, scraping_worldathletics.WorldAthleticsScrapper, "United States",
+                       "/worldathletics/graphql", "profile_url"),
+}
+
+
+def _graphql_payload() -> Dict:
+    """
+    searchCompetitors response listing the athletes of the recorded search table.
+    """
+    html = (FIXTURES_DIR / "worldathletics" / "roster.html").read_text(encoding="utf-8")
+    athletes = [
+        {"givenName": player["name"], "familyName": "", "gender": player["gender"],
+         "urlSlug": f"/athletes/united-states{player['profile_url']}"}
+        for player in scraping_worldathletics.parse_roster_html(html).values()
+    ]
+    return {"data": {"searchCompetitors": athletes}}
+
+
+def serve(port: int, latency_ms: float, jitter_ms: float, error_rate: float, rate_429: float,
+          retry_after: int, seed: int, ready):
+    """
+    Fixture server process: /<source>/... serves that source's roster or profile page.
+    """
+    pages = {
+        source: {kind: (FIXTURES_DIR / source / f"{kind}.html").read_text(encoding="utf-8")
+                 for kind in ("roster", "profile")}
+        for source in SOURCES
+    }
+    graphql = json.dumps(_graphql_payload())
+    rng = random.Random(seed)
+
+    async def handler(request: web.Request) -> web.Response:
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        roll = rng.random()
+        if roll < rate_429:
+            return web.Response(status=429, headers={"Retry-After": str(retry_after)})
+        if roll < rate_429 + error_rate:
+            return web.Response(status=500)
+
+        source = request.path.split("/")[1]
+        if source not in pages:
+            return web.Response(status=404)
+        if request.path == "/worldathletics/graphql":
+            return web.Response(text=graphql, content_type="application/json")
+        kind = "roster" if request.path.startswith(SOURCES[source][3]) else "profile"
+        return web.Response(text=pages[source][kind], content_type="text/html")
+
+    async def main():
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def timed_call(func, *args):
+    """
+    Run `func` in a parse worker and report how long the parse itself took there.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class TimedParsePool(ParsePool):
+
+    def __init__(self, workers: int = None):
+        super().__init__(workers)
+        self.seconds: List[float] = []
+
+
+    async def parse(self, func, *args):
+        result, seconds = await super().parse(timed_call, func, *args)
+        self.seconds.append(seconds)
+        return result
+
+
+class RequestTimer:
+    """
+    Client-side duration and status of every request, from aiohttp's tracing hooks.
+    """
+
+    def __init__(self):
+        self.seconds: List[float] = []
+        self.statuses = Counter()
+
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.start = time.perf_counter()
+
+        async def on_request_end(session, context, params):
+            self.seconds.append(time.perf_counter() - context.start)
+            self.statuses[params.response.status] += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def repeat_roster(roster: Dict[str, Dict], url_field: str, players: int) -> Dict[str, Dict]:
+    """
+    The discovered roster repeated until it has `players` entries, each with its own profile URL.
+    """
+    entries = list(roster.values())
+    repeated = {}
+    for i in range(players if entries else 0):
+        entry = dict(entries[i % len(entries)])
+        copy = i // len(entries)
+        if copy:
+            entry[url_field] = f"{entry[url_field]}-{copy}"
+        repeated[entry[url_field] or f"{entry['name']}-{i}"] = entry
+    return repeated
+
+
+async def bench_source(source: str, players: int, scheduler: FetchScheduler, parse_pool: TimedParsePool,
+                       log_dir: str) -> Dict:
+    module, scraper_class, country, _, url_field = SOURCES[source]
+    # a fresh directory per source, so no fetch cache from an earlier run turns fetches into 304s
+    os.makedirs(os.path.join(log_dir, source))
+    scraper = scraper_class(
+        country,
+        url_log_path=os.path.join(log_dir, source, "player_profile_urls.json"),
+        data_log_path=os.path.join(log_dir, source, "player_data.json"),
+        scheduler=scheduler,
+        parse_pool=parse_pool,
+    )
+    timer = RequestTimer()
+    parse_pool.seconds = []
+
+    async with client_session(scheduler.max_in_flight, trace_configs=[timer.trace_config()]) as session:
+        start = time.perf_counter()
+        roster = await scraper.discover_players(session)
+        discovery_seconds = time.perf_counter() - start
+
+        player_data = repeat_roster(roster, url_field, players)
+        start = time.perf_counter()
+        fetched = await scraper.fetch_all_profiles(player_data, session)
+        fetch_seconds = time.perf_counter() - start
+
+    failed = sum(1 for record in scraper.profile_stream.records() if module.is_error_record(record))
+    return {
+        "source": source,
+        "discovered": len(roster),
+        "discovery_seconds": discovery_seconds,
+        "profiles": fetched,
+        "failed": failed,
+        "fetch_seconds": fetch_seconds,
+        "profiles_per_second": fetched / fetch_seconds if fetch_seconds else 0.0,
+        "requests": len(timer.seconds),
+        "status_429": timer.statuses[429],
+        "status_5xx": sum(count for status, count in timer.statuses.items() if status >= 500),
+        "p50_ms": percentile(timer.seconds, 0.50) * 1000,
+        "p99_ms": percentile(timer.seconds, 0.99) * 1000,
+        "parse_ms": statistics.mean(parse_pool.seconds) * 1000 if parse_pool.seconds else 0.0,
+    }
+
+
+def print_report(results: List[Dict], peak_rss_mb: float, workers_rss_mb: float):
+    print(f"\n{'source':<16}{'found':>7}{'disc s':>8}{'profiles':>10}{'failed':>8}{'profiles/s':>12}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'429s':>6}{'5xx':>6}{'parse ms':>10}")
+    for r in results:
+        print(f"{r['source']:<16}{r['discovered']:>7}{r['discovery_seconds']:>8.2f}{r['profiles']:>10}"
+              f"{r['failed']:>8}{r['profiles_per_second']:>12.1f}{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+              f"{r['status_429']:>6}{r['status_5xx']:>6}{r['parse_ms']:>10.2f}")
+    print(f"\npeak RSS: {peak_rss_mb:.1f} MB (scrapers), {workers_rss_mb:.1f} MB (largest parse worker)")
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["source"]: r for r in json.load(f)["results"]}
+    ok = True
+    for r in results:
+        before = baseline.get(r["source"])
+        if not before or not before["profiles_per_second"]:
+            continue
+        change = r["profiles_per_second"] / before["profiles_per_second"] - 1
+        if change < -tolerance:
+            ok = False
+        print(f"{r['source']:<16}{before['profiles_per_second']:>10.1f} -> {r['profiles_per_second']:>8.1f} "
+              f"profiles/s ({change:+.0%}){'  REGRESSION' if change < -tolerance else ''}")
+    return ok
+
+
+async def run(args) -> List[Dict]:
+    # every source is on 127.0.0.1 here, so they all share one host's budget (unthrottled by default)
+    scheduler = FetchScheduler(args.max_in_flight, args.rate, max(1, int(args.rate)))
+    parse_pool = TimedParsePool(args.workers)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            for source in args.sources:
+                results.append(await bench_source(source, args.players, scheduler, parse_pool, log_dir))
+    finally:
+        parse_pool.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", nargs="+", choices=list(SOURCES), default=list(SOURCES))
+    parser.add_argument("--players", type=int, default=500, help="profiles to fetch per source")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of responses that are 500s")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="share of responses that are 429s")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--max-in-flight", type=int, help="scheduler limit (default MAX_CONCURRENT_REQUESTS)")
+    parser.add_argument("--rate", type=float, default=UNTHROTTLED_RATE,
+                        help="requests/second per host (default: unthrottled; the production limit is "
+                             "REQUESTS_PER_SECOND_PER_HOST)")
+    parser.add_argument("--workers", type=int, help="parse workers (default PARSE_WORKERS)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare profiles/s against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed profiles/s drop vs the baseline")
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(PORT, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_429, args.retry_after, args.seed, ready),
+        daemon=True,
+    )
+    server.start()
+    try:
+        if not ready.wait(10):
+            sys.exit("fixture server did not start")
+        results = asyncio.run(run(args))
+        # the parse workers have exited by now, so their peak is in RUSAGE_CHILDREN
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        workers_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    finally:
+        server.terminate()
+        server.join()
+
+    print_report(results, peak_rss_mb, workers_rss_mb)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "peak_rss_mb": peak_rss_mb, "workers_rss_mb": workers_rss_mb,
+                       "results": results}, f, indent=2)
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import List
+
+from decouple import config
+from selenium import webdriver
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+# upper bound for any readiness wait during discovery; normally the page is ready much sooner
+DISCOVERY_TIMEOUT = config("DISCOVERY_TIMEOUT", default=20, cast=float)
+# how long a lazy-loaded list may stay the same size before it counts as fully loaded
+SCROLL_SETTLE_SECONDS = config("SCROLL_SETTLE_SECONDS", default=1.5, cast=float)
+
+
+def create_driver() -> webdriver.Chrome:
+    chrome_options = Options()
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    # chrome_options.add_argument("--start-fullscreen")
+    chrome_options.add_argument('--headless')  # Run Chrome in headless mode
+    chrome_options.add_argument('--disable-gpu')  # (optional) Disable GPU acceleration, recommended in headless mode
+    chrome_options.add_argument('--no-sandbox')  # (optional) Required in some Linux environments
+    chrome_options.add_argument('--window-size=1920,1080')  # Optional: set window size to avoid resolution issues
+    service = ChromeService()
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+
+def wait_for_elements(driver: webdriver.Chrome, css_selector: str, timeout: float = None) -> int:
+    """
+    Block until at least one element matches `css_selector`; returns how many match.
+    Raises TimeoutException if nothing shows up within `timeout`.
+    """
+    elements = WebDriverWait(driver, timeout or DISCOVERY_TIMEOUT).until(
+        EC.presence_of_all_elements_located((By.CSS_SELECTOR, css_selector))
+    )
+    return len(elements)
+
+
+def scroll_until_stable(driver: webdriver.Chrome, css_selector: str, timeout: float = None,
+                        settle: float = None) -> int:
+    """
+    Keep scrolling to the bottom while new `css_selector` elements keep appearing,
+    and stop once the count has not grown for `settle` seconds. Returns the final count.
+    """
+    deadline = time.monotonic() + (timeout or DISCOVERY_TIMEOUT)
+    settle = settle or SCROLL_SETTLE_SECONDS
+    count = len(driver.find_elements(By.CSS_SELECTOR, css_selector))
+
+    while time.monotonic() < deadline:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        try:
+            WebDriverWait(driver, min(settle, max(0.0, deadline - time.monotonic())), poll_frequency=0.1).until(
+                lambda d: len(d.find_elements(By.CSS_SELECTOR, css_selector)) > count
+            )
+        except TimeoutException:
+            break
+        count = len(driver.find_elements(By.CSS_SELECTOR, css_selector))
+    return count
+
+
+def first_element_text(driver: webdriver.Chrome, css_selector: str) -> str:
+    try:
+        elements = driver.find_elements(By.CSS_SELECTOR, css_selector)
+        return elements[0].text if elements else ""
+    except StaleElementReferenceException:
+        return ""
+
+
+def wait_for_text_change(driver: webdriver.Chrome, css_selector: str, previous_text: str,
+                         timeout: float = None) -> bool:
+    """
+    Wait until the first `css_selector` element exists and no longer shows `previous_text`,
+    e.g. a results table re-rendered after changing a filter. Returns False on timeout.
+    """
+    try:
+        WebDriverWait(driver, timeout or DISCOVERY_TIMEOUT, poll_frequency=0.1).until(
+            lambda d: first_element_text(d, css_selector) not in ("", previous_text)
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+class _PooledBrowser:
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` headless Chrome sessions warm for roster discovery.
+
+    Scrapers borrow a driver with `with pool.browser() as driver:`. A session is
+    health-checked before it is handed out, and quit and replaced after
+    `max_pages` pages so a long crawl does not keep one Chrome growing forever.
+    Borrowing blocks while every session is in use.
+    """
+
+    SIZE = config("BROWSER_POOL_SIZE", default=2, cast=int)
+    MAX_PAGES = config("BROWSER_MAX_PAGES", default=50, cast=int)
+
+    def __init__(self, size: int = None, max_pages: int = None):
+        self.size = size or self.SIZE
+        self.max_pages = max_pages or self.MAX_PAGES
+
+        self._idle: List[_PooledBrowser] = []
+        self._created = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+
+    def _is_healthy(self, browser: _PooledBrowser) -> bool:
+        try:
+            browser.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+
+    def _quit(self, browser: _PooledBrowser):
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            print("Error closing browser:", e)
+
+
+    def _acquire(self) -> _PooledBrowser:
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    browser = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    browser = None
+                    break
+                self._condition.wait()
+
+        if browser is not None and self._is_healthy(browser):
+            return browser
+        if browser is not None:
+            print("Replacing unresponsive browser session")
+            self._quit(browser)
+
+        try:
+            return _PooledBrowser(create_driver())
+        except Exception:
+            self._discard()
+            raise
+
+
+    def _discard(self):
+        with self._condition:
+            self._created -= 1
+            self._condition.notify()
+
+
+    def _release(self, browser: _PooledBrowser, failed: bool = False):
+        browser.pages += 1
+        if failed or self._closed or browser.pages >= self.max_pages:
+            self._quit(browser)
+            self._discard()
+            return
+
+        try:
+            # don't leak cookies / storage from one site into the next borrower
+            browser.driver.delete_all_cookies()
+            browser.driver.get("about:blank")
+        except Exception:
+            self._quit(browser)
+            self._discard()
+            return
+
+        with self._condition:
+            self._idle.append(browser)
+            self._condition.notify()
+
+
+    @contextmanager
+    def browser(self):
+        browser = self._acquire()
+        try:
+            yield browser.driver
+        except BaseException:
+            self._release(browser, failed=True)
+            raise
+        self._release(browser)
+
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._condition.notify_all()
+        for browser in idle:
+            self._quit(browser)
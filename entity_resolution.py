@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from decouple import config
+
+from player_api import snapshot_version
+from player_store import COLUMNS
+from search_index import tokenize, trigrams
+
+
+ENTITIES_PATH = config("ENTITIES_PATH", default="logs_entities/entities.json")
+
+# blocks bigger than this (very common names in one birth year) are skipped rather than compared pairwise
+MAX_BLOCK = 50
+# pairs scoring at least this are the same player
+MATCH_SCORE = 4.0
+
+NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv"}
+COUNTRY_ALIASES = {"usa": "united states", "us": "united states", "american": "united states"}
+
+Member = Tuple[str, int]  # (source, row in its snapshot)
+
+
+class _Candidate:
+
+    def __init__(self, source: str, row: int, player: Dict):
+        columns = COLUMNS.get(source, {})
+        self.source = source
+        self.row = row
+        self.name = " ".join(str(player.get(columns.get("name")) or "").split())
+        self.tokens = sorted(token for token in tokenize(self.name) if token not in NAME_SUFFIXES)
+        self.name_key = " ".join(self.tokens)
+        self.team_tokens = set(tokenize(player.get(columns["team"]))) if "team" in columns else set()
+        country = " ".join(tokenize(player.get(columns["country"]))) if "country" in columns else ""
+        self.country = COUNTRY_ALIASES.get(country, country)
+        self.birthdate = player.get("birthdate") if isinstance(player.get("birthdate"), str) and player["birthdate"][:4].isdigit() else None
+        self.age = player.get("age") if isinstance(player.get("age"), int) else None
+        self.height = player.get("height_cm") if isinstance(player.get("height_cm"), (int, float)) else None
+        url = player.get("profile_url") or player.get("Profile URL") or player.get("Player Profile Link")
+        self.key = f"{source}:{url or self.name}"
+
+
+    def blocking_keys(self) -> List[str]:
+        keys = [f"name:{self.name_key}"]
+        if self.birthdate:
+            years = [int(self.birthdate[:4])]
+        elif self.age is not None:
+            # born this many years ago, or one more if the birthday hasn't come yet
+            years = [date.today().year - self.age, date.today().year - self.age - 1]
+        else:
+            years = []
+        for token in self.tokens:
+            if len(token) >= 3:
+                keys.extend(f"token:{token}:{year}" for year in years)
+        return keys
+
+
+def _name_similarity(a: _Candidate, b: _Candidate) -> float:
+    if a.name_key == b.name_key:
+        return 1.0
+    grams_a, grams_b = trigrams(a.name_key), trigrams(b.name_key)
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def score_pair(a: _Candidate, b: _Candidate) -> float:
+    """
+    Evidence that two records from different sources are the same player: name
+    similarity, then birthdate (or age), height, team and nationality.
+    """
+    score = 3.0 * _name_similarity(a, b)
+    if a.birthdate and b.birthdate:
+        score += 3.0 if a.birthdate == b.birthdate else -5.0
+    elif a.age is not None and b.age is not None:
+        score += 1.0 if abs(a.age - b.age) <= 1 else -3.0
+    if a.height is not None and b.height is not None:
+        difference = abs(a.height - b.height)
+        score += 1.5 if difference <= 3 else (-2.0 if difference > 6 else 0.0)
+    if a.team_tokens & b.team_tokens:
+        score += 1.5
+    if a.country and b.country and a.country == b.country:
+        score += 0.5
+    return score
+
+
+class _UnionFind:
+    """
+    Clusters of members, never joining two clusters that already hold a record from
+    the same source: a source lists each player once.
+    """
+
+    def __init__(self, members: List[_Candidate]):
+        self.parent = list(range(len(members)))
+        self.sources = [{member.source} for member in members]
+
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+
+    def union(self, i: int, j: int) -> bool:
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i == root_j or self.sources[root_i] & self.sources[root_j]:
+            return False
+        if len(self.sources[root_i]) < len(self.sources[root_j]):
+            root_i, root_j = root_j, root_i
+        self.parent[root_j] = root_i
+        self.sources[root_i] |= self.sources[root_j]
+        return True
+
+
+class EntityIndex:
+    """
+    Merged players across sources, each under a stable ID.
+
+    IDs are kept in ENTITIES_PATH (member key -> ID), so a player keeps its ID across
+    runs as long as any of its records is still around; new clusters get an ID
+    derived from their first member.
+
+    Members are rows of the snapshots the index was resolved from (`versions`, by
+    source). A source whose snapshot has been swapped since has other rows, so its
+    members only count again once the index has been resolved over the new one.
+    """
+
+    def __init__(self, entities: Dict[str, List[Member]], names: Dict[str, str], versions: Dict[str, str] = None):
+        self.entities = entities
+        self.names = names
+        self.versions = versions or {}
+        self.entity_of: Dict[Member, str] = {
+            member: entity_id for entity_id, members in entities.items() for member in members
+        }
+
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+
+    def get(self, entity_id: str) -> Optional[List[Member]]:
+        return self.entities.get(entity_id)
+
+
+    def is_current(self, member: Member, snapshots: Dict[str, Sequence]) -> bool:
+        source, row = member
+        players = snapshots.get(source)
+        return (players is not None and snapshot_version(players) == self.versions.get(source)
+                and 0 <= row < len(players))
+
+
+    def current_members(self, entity_id: str, snapshots: Dict[str, Sequence]) -> List[Member]:
+        return [member for member in self.entities.get(entity_id, ()) if self.is_current(member, snapshots)]
+
+
+    def current_entity(self, member: Member, snapshots: Dict[str, Sequence]) -> Optional[str]:
+        return self.entity_of.get(member) if self.is_current(member, snapshots) else None
+
+
+def _load_ids(path: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable entity ids {path}: {e}")
+        return {}
+
+
+def _save_ids(path: str, ids: Dict[str, str]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(ids, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def resolve_entities(sources: Dict[str, Sequence[Dict]], ids_path: str = None) -> EntityIndex:
+    """
+    Cluster the players of every source: block on normalized name keys and name
+    token + birth year, score the pairs inside each block, and union the matches.
+    `sources` should be the snapshots being served, so the rows point into them.
+    """
+    ids_path = ids_path or ENTITIES_PATH
+    candidates = [
+        _Candidate(source, row, player)
+        for source, players in sources.items()
+        for row, player in enumerate(players)
+    ]
+
+    blocks = defaultdict(list)
+    for index, candidate in enumerate(candidates):
+        if candidate.tokens:
+            for key in candidate.blocking_keys():
+                blocks[key].append(index)
+
+    clusters = _UnionFind(candidates)
+    compared = set()
+    scored = []
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = members[x], members[y]
+                if candidates[i].source == candidates[j].source or (i, j) in compared:
+                    continue
+                compared.add((i, j))
+                score = score_pair(candidates[i], candidates[j])
+                if score >= MATCH_SCORE:
+                    scored.append((score, i, j))
+    # strongest matches first, so a weak link can't claim a source slot a strong one needs
+    for _, i, j in sorted(scored, reverse=True):
+        clusters.union(i, j)
+
+    grouped = defaultdict(list)
+    for index in range(len(candidates)):
+        grouped[clusters.find(index)].append(index)
+
+    previous_ids = _load_ids(ids_path)
+    ids, entities, names = {}, {}, {}
+    for indexes in grouped.values():
+        keys = sorted(candidates[i].key for i in indexes)
+        known = sorted(previous_ids[key] for key in keys if key in previous_ids and previous_ids[key] not in entities)
+        entity_id = known[0] if known else "pl_" + hashlib.sha1(keys[0].encode("utf-8")).hexdigest()[:12]
+        while entity_id in entities:
+            # namesakes without profile URLs share a member key
+            entity_id = "pl_" + hashlib.sha1(f"{entity_id}{keys[0]}".encode("utf-8")).hexdigest()[:12]
+        entities[entity_id] = [(candidates[i].source, candidates[i].row) for i in indexes]
+        names[entity_id] = candidates[indexes[0]].name
+        ids.update((key, entity_id) for key in keys)
+
+    _save_ids(ids_path, ids)
+    merged = sum(1 for members in entities.values() if len(members) > 1)
+    print(f"Entity resolution: {len(candidates)} records, {len(entities)} players, "
+          f"{merged} matched across sources ({len(compared)} pairs compared)")
+    return EntityIndex(entities, names, {source: snapshot_version(players) for source, players in sources.items()})
@@ -0,0 +1,132 @@
+import bisect
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+from player_listing import sort_key
+from snapshot import open_snapshot
+
+
+class FetchCache:
+    """
+    On-disk cache of profile page validators, keyed by profile URL.
+
+    For every URL it keeps the ETag / Last-Modified validators, a hash of the body and
+    the names of the fields parsed from it. On the next scrape the validators are sent
+    back as If-None-Match / If-Modified-Since; a 304, or a 200 whose body hash did not
+    change, reuses the record instead of parsing the page again.
+
+    The parsed values themselves are not kept: they are read back from the previous
+    run's output (`data_path`, through its memory-mapped snapshot), so memory grows by
+    a few short strings per profile rather than by whole records. That is also why the
+    cache must only be saved once that output has been written (see `save`).
+    """
+
+    def __init__(self, path: str, data_path: str, source: str = None):
+        self.path = path
+        self.data_path = data_path
+        self.source = source
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        # one shared tuple per distinct set of parsed field names
+        self._field_sets: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self._previous = None
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable fetch cache {path}: {e}")
+        for entry in self.entries.values():
+            # caches written before only the field names were kept hold the whole record
+            fields = entry.pop("record", None) or entry.get("fields", ())
+            entry["fields"] = self._intern(tuple(fields))
+
+
+    def _intern(self, fields: Tuple[str, ...]) -> Tuple[str, ...]:
+        return self._field_sets.setdefault(fields, fields)
+
+
+    @staticmethod
+    def body_hash(html: str) -> str:
+        return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+    def _previous_record(self, url: str) -> Optional[Dict]:
+        """
+        The previous output's record for `url`: a binary search over the snapshot's
+        precomputed profile_url order, decoding a handful of records.
+        """
+        if self._previous is None:
+            self._previous = open_snapshot(self.data_path, self.source)
+        if not self._previous:
+            return None
+        ascending, _ = self._previous.sort_order("profile_url")
+        target = sort_key(url)
+        position = bisect.bisect_left(
+            ascending, target, key=lambda row: sort_key(self._previous.raw_record(row).get("profile_url")))
+        # case-insensitive ties sort next to each other
+        for row in ascending[position:]:
+            record = self._previous.raw_record(row)
+            if record.get("profile_url") == url:
+                return record
+            if sort_key(record.get("profile_url")) != target:
+                return None
+        return None
+
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.entries.get(url)
+        headers = {}
+        # validators are only worth sending while the record they stand for can be read back
+        if not entry or self._previous_record(url) is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+
+    def lookup(self, url: str, html: Optional[str]) -> Optional[Dict]:
+        """
+        Previous record for `url` if the page is unchanged: `html` is None for a
+        304 response, otherwise it is compared by hash.
+        """
+        entry = self.entries.get(url)
+        if entry and (html is None or entry["body_hash"] == self.body_hash(html)):
+            record = self._previous_record(url)
+            if record is not None:
+                self.hits += 1
+                return {field: record.get(field) for field in entry["fields"]}
+        if html is None:
+            raise ValueError(f"Got 304 for {url} without a cached copy")
+        self.misses += 1
+        return None
+
+
+    def store(self, url: str, html: Optional[str], record: Dict, etag: str = None, last_modified: str = None):
+        previous = self.entries.get(url, {})
+        self.entries[url] = {
+            "etag": etag or previous.get("etag"),
+            "last_modified": last_modified or previous.get("last_modified"),
+            "body_hash": self.body_hash(html) if html is not None else previous.get("body_hash"),
+            "fields": self._intern(tuple(record)),
+        }
+
+
+    def save(self):
+        """
+        Write the validators. Call it only after the records they were stored with have
+        been written to `data_path`, otherwise a later 304 would reuse an older record.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        # the output has been rewritten; look records up in the new one from now on
+        self._previous = None
+        print(f"Fetch cache: {self.hits} unchanged, {self.misses} parsed, written to: {self.path}")
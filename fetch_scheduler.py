@@ -0,0 +1,145 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from decouple import config
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+    The effective rate can be lowered and raised again at runtime (see FetchScheduler.report).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.failures = 0
+        # bumped on every back-off, so a request that got its token before one can tell
+        self.backoffs = 0
+        self._lock = asyncio.Lock()
+
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds a Retry-After header asks to wait, in either of its forms
+    (delay-seconds or an HTTP-date); None if it is missing or unreadable.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class FetchScheduler:
+    """
+    Shares one request budget between every profile fetch of a run.
+
+    - at most `max_in_flight` requests are open at the same time (all hosts together)
+    - each host gets its own token bucket of `rate_per_host` requests/second
+    - a 429 or 5xx halves that host's rate and pauses it (Retry-After is honoured),
+      every success after that slowly raises the rate back to the configured value
+    """
+
+    MAX_IN_FLIGHT = config("MAX_CONCURRENT_REQUESTS", default=20, cast=int)
+    RATE_PER_HOST = config("REQUESTS_PER_SECOND_PER_HOST", default=5.0, cast=float)
+    BURST_PER_HOST = config("REQUEST_BURST_PER_HOST", default=5, cast=int)
+
+    MIN_RATE = 0.2
+    MAX_BACKOFF = 60.0
+    # a Retry-After longer than this is cut short; the retry policy gives up on the host well before
+    MAX_RETRY_AFTER = 300.0
+
+    def __init__(self, max_in_flight: int = None, rate_per_host: float = None, burst_per_host: int = None):
+        self.max_in_flight = max_in_flight or self.MAX_IN_FLIGHT
+        self.rate_per_host = rate_per_host or self.RATE_PER_HOST
+        self.burst_per_host = burst_per_host or self.BURST_PER_HOST
+
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._buckets: Dict[str, TokenBucket] = {}
+
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate_per_host, self.burst_per_host)
+        return self._buckets[host]
+
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        Wait for the host's rate limit and a free in-flight slot before making a request to `url`.
+        """
+        bucket = self._bucket(url)
+        while True:
+            await bucket.acquire()
+            backoffs = bucket.backoffs
+            await self._semaphore.acquire()
+            if bucket.backoffs == backoffs:
+                break
+            # the host backed off while this request waited for a slot, so its token was taken
+            # before the pause and at the old rate: give the slot back and queue for the host again
+            self._semaphore.release()
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+    def report(self, url: str, status: int, retry_after: Optional[str] = None):
+        """
+        Feed the response status back so the host's rate can adapt.
+        """
+        bucket = self._bucket(url)
+
+        if status == 429 or status >= 500:
+            bucket.failures += 1
+            bucket.backoffs += 1
+            bucket.rate = max(self.MIN_RATE, bucket.rate / 2)
+            delay = min(self.MAX_BACKOFF, 2 ** (bucket.failures - 1))
+            requested = retry_after_seconds(retry_after)
+            if requested is not None:
+                delay = max(delay, min(self.MAX_RETRY_AFTER, requested))
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+            print(f"HTTP {status} from {urlsplit(url).netloc}, backing off {delay:.1f}s "
+                  f"(rate now {bucket.rate:.2f}/s)")
+        else:
+            bucket.failures = 0
+            bucket.rate = min(bucket.max_rate, bucket.rate + 0.1 * bucket.max_rate)
@@ -0,0 +1,90 @@
+from typing import List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+from decouple import config
+
+
+HTML_PARSER = config("HTML_PARSER", default="lxml")
+BACKENDS = ("html.parser", "lxml", "selectolax")
+
+# (tag, class attribute) pairs naming the containers a scraper actually reads,
+# e.g. [("div", "bio"), ("div", "parcours")]
+Targets = List[Tuple[str, str]]
+
+_unavailable_reported = set()
+
+
+def _available(backend: str) -> bool:
+    try:
+        if backend == "lxml":
+            import lxml  # noqa: F401
+        elif backend == "selectolax":
+            import selectolax  # noqa: F401
+    except ImportError:
+        if backend not in _unavailable_reported:
+            _unavailable_reported.add(backend)
+            print(f"HTML parser backend '{backend}' is not installed, falling back to html.parser")
+        return False
+    return True
+
+
+def resolve_backend(backend: str = None) -> str:
+    backend = backend or HTML_PARSER
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend '{backend}', expected one of {BACKENDS}")
+    return backend if _available(backend) else "html.parser"
+
+
+def _css_selector(tag: str, class_name: str) -> str:
+    # "bloc jou" -> "div.bloc.jou"
+    return tag + "".join(f".{name}" for name in class_name.split())
+
+
+def _class_matcher(targets: Targets):
+    """
+    Match a class attribute the way the CSS selector `tag.a.b` would: every class of a
+    target must be present, extra classes are fine. The strainer sees the raw attribute
+    string while parsing, so the tokens are split here.
+    """
+    wanted = [set(class_name.split()) for _, class_name in targets]
+
+    def matches(value) -> bool:
+        if not value:
+            return False
+        classes = set(value.split() if isinstance(value, str) else value)
+        return any(required <= classes for required in wanted)
+
+    return matches
+
+
+def _select_fragments(html: str, targets: Targets) -> str:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    fragments = []
+    for tag, class_name in targets:
+        fragments.extend(node.html for node in tree.css(_css_selector(tag, class_name)))
+    return "".join(fragments)
+
+
+def make_soup(html: str, targets: Optional[Targets] = None, backend: str = None) -> BeautifulSoup:
+    """
+    Build a BeautifulSoup for `html` with the configured backend (HTML_PARSER).
+
+    When `targets` is given only those containers (and their children) end up in the
+    soup, so the scrapers' existing find/find_all code keeps working on a much smaller tree:
+    - html.parser / lxml skip everything else while parsing (SoupStrainer)
+    - selectolax locates the containers with its C CSS engine and only their
+      markup is handed to BeautifulSoup
+    """
+    backend = resolve_backend(backend)
+
+    if backend == "selectolax":
+        if targets:
+            html = _select_fragments(html, targets)
+        return BeautifulSoup(html, "lxml" if _available("lxml") else "html.parser")
+
+    parse_only = None
+    if targets:
+        parse_only = SoupStrainer(list({tag for tag, _ in targets}), class_=_class_matcher(targets))
+    return BeautifulSoup(html, backend, parse_only=parse_only)
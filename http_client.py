@@ -0,0 +1,113 @@
+import ssl
+from typing import List
+
+import aiohttp
+import certifi
+from decouple import config
+
+import metrics
+
+
+# aiohttp speaks HTTP/1.1 only; connection reuse below is what saves the handshakes
+CONNECTIONS_PER_HOST = config("HTTP_CONNECTIONS_PER_HOST", default=10, cast=int)
+DNS_CACHE_SECONDS = config("HTTP_DNS_CACHE_SECONDS", default=300, cast=int)
+KEEPALIVE_SECONDS = config("HTTP_KEEPALIVE_SECONDS", default=30.0, cast=float)
+# only for hosts with a broken certificate chain; never turn this off in production
+VERIFY_SSL = config("HTTP_VERIFY_SSL", default=True, cast=bool)
+
+
+def ssl_context() -> ssl.SSLContext:
+    if not VERIFY_SSL:
+        return ssl._create_unverified_context()
+    # certifi's bundle instead of the OS one, so verification works the same in every container
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class ConnectionStats:
+    """
+    Counts from aiohttp's tracing hooks: how many requests went out over a new
+    connection (TCP + TLS handshake) versus an idle keep-alive one, and DNS cache use.
+    Each hook also counts into the matching metric, so /metrics shows them too.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.failed = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+
+    @property
+    def reuse_rate(self) -> float:
+        connections = self.new_connections + self.reused_connections
+        return self.reused_connections / connections if connections else 0.0
+
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_end(session, context, params):
+            self.requests += 1
+            metrics.HTTP_REQUESTS.inc(result="ok")
+
+        async def on_request_exception(session, context, params):
+            self.failed += 1
+            metrics.HTTP_REQUESTS.inc(result="failed")
+
+        async def on_connection_create_end(session, context, params):
+            self.new_connections += 1
+            metrics.HTTP_CONNECTIONS.inc(connection="new")
+
+        async def on_connection_reuseconn(session, context, params):
+            self.reused_connections += 1
+            metrics.HTTP_CONNECTIONS.inc(connection="reused")
+
+        async def on_dns_cache_hit(session, context, params):
+            self.dns_hits += 1
+            metrics.DNS_LOOKUPS.inc(result="hit")
+
+        async def on_dns_cache_miss(session, context, params):
+            self.dns_misses += 1
+            metrics.DNS_LOOKUPS.inc(result="miss")
+
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        trace.freeze()
+        return trace
+
+
+    def report(self) -> str:
+        return (f"HTTP: {self.requests} requests ({self.failed} failed), {self.new_connections} new / "
+                f"{self.reused_connections} reused connections ({self.reuse_rate:.0%} reuse), "
+                f"DNS cache {self.dns_hits} hits / {self.dns_misses} misses")
+
+
+# one set of counters for the process, shared by every session client_session() makes
+connection_stats = ConnectionStats()
+
+
+def client_session(limit: int = 100, trace_configs: List[aiohttp.TraceConfig] = (), **kwargs) -> aiohttp.ClientSession:
+    """
+    The ClientSession every scraper fetches through: at most `limit` connections
+    (CONNECTIONS_PER_HOST per host), cached DNS, idle connections kept open for
+    reuse, verified TLS. Must be created inside the event loop that will use it.
+    `trace_configs` are added to the one that feeds connection_stats.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=CONNECTIONS_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_SECONDS,
+        keepalive_timeout=KEEPALIVE_SECONDS,
+        ssl=ssl_context(),
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        trace_configs=[connection_stats.trace_config(), *trace_configs],
+        **kwargs,
+    )
@@ -1,110 +1,353 @@
-import json
+import asyncio
+import time
+from typing import Dict
 
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from decouple import config
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from pathlib import Path
 
-from scraping_allrugby import AllRugbyScraper
-from scraping_rugbypass import RugbyPassScrapper
-from scraping_worldathletics import WorldAthleticsScrapper
+import metrics
+from aggregates import DEFAULT_TOP, SourceAggregates
+from entity_resolution import EntityIndex, resolve_entities
+from fetch_scheduler import FetchScheduler
+from page_cache import NegotiatingGZipMiddleware, PageCache
+from parse_pool import ParsePool
+from player_api import DEFAULT_API_LIMIT, FORMATS, ApiError, PlayerApi, StaleCursor, parse_fields, snapshot_version
+from player_listing import DEFAULT_PAGE_SIZE, PlayerListing
+from player_store import PlayerStore, StoreListing
+from search_index import DEFAULT_LIMIT, SearchIndex
+from snapshot import open_snapshot
+from sources import SOURCES, Source
+
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
+# brotli when the optional brotli-asgi package is installed (it falls back to gzip for other clients)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1000)
+else:
+    app.add_middleware(NegotiatingGZipMiddleware, minimum_size=1000)
+
+# re-scrape sources that already have a snapshot; cheap thanks to the per-source fetch cache
+REFRESH_ON_STARTUP = config("REFRESH_ON_STARTUP", default=False, cast=bool)
+# "snapshot": memory-mapped snapshot per worker; "sqlite": one shared PlayerStore database
+PLAYER_BACKEND = config("PLAYER_BACKEND", default="snapshot")
+
+# one request budget, parse worker pool and set of warm browsers shared by every scraper started from the app;
+# the browsers, the keep-alive connection pool and the retry policy are only created by the first scrape
+# (see scrape_resources)
+fetch_scheduler = FetchScheduler()
+parse_pool = ParsePool()
+browser_pool = None
+http_session = None
+retry_policy = None
+player_store = PlayerStore() if PLAYER_BACKEND == "sqlite" else None
+search_index = SearchIndex()
+# players matched across sources; recomputed in the background whenever a source's snapshot changes
+entity_index = EntityIndex({}, {})
+entities_task = None
+entities_stale = False
+
+
+# last good snapshot per source; replaced as a whole when a scrape finishes
+listings = {source: PlayerListing([]) for source in SOURCES}
+snapshots = {source: [] for source in SOURCES}
+# numeric summaries per source, recomputed for a source whenever its snapshot is loaded
+aggregates = {source: SourceAggregates(source, []) for source in SOURCES}
+player_api = PlayerApi({name: source.sort_fields for name, source in SOURCES.items()})
+page_cache = PageCache()
+# sources with a scrape running in the background
+refreshing = set()
+background_tasks = set()
+
+
+def build_listing(source: str, players) -> PlayerListing:
+    fields = SOURCES[source]
+    if player_store is not None:
+        # no-op unless the snapshot changed since it was last imported (e.g. by another worker)
+        player_store.import_snapshot(source, fields.snapshot_path)
+        return StoreListing(player_store, source, fields.sort_fields, fields.search_fields)
+    # memory-mapped; records are decoded only for the rows a page shows
+    return PlayerListing(players, fields.sort_fields, fields.search_fields)
+
 
+def load_source(source: str) -> PlayerListing:
+    players = open_snapshot(SOURCES[source].snapshot_path, source)
+    listing = build_listing(source, players)
+    # re-index only this source; the other sources' segments are untouched
+    search_index.update_source(source, players)
+    aggregates[source] = SourceAggregates(source, players, SOURCES[source].group_fields)
+    snapshots[source] = players
+    return listing
 
-allrugby_path = Path("logs_allrugby/player_data.json")
-rugbypass_path = Path("logs_rugbypass/player_data.json")
-worldathletics_path = Path("logs_worldathletics/player_data.json")
-sports247_path = Path("logs_247sports/player_data.json")
-eurobasket_path = Path("logs_eurobasket/player_data.json")
-proballers_path = Path("logs_proballers/player_data.json")
 
+def scrape_resources():
+    """
+    Browser pool, HTTP connection pool and retry policy for app-started scrapes, created
+    on first use so a worker that only serves snapshots never imports Selenium or aiohttp.
+    The retry policy outlives each scrape, so a host whose circuit breaker is open stays
+    short-circuited on the next refresh until its trial request succeeds.
+    """
+    global browser_pool, http_session, retry_policy
+    if browser_pool is None:
+        from browser_pool import BrowserPool
+        browser_pool = BrowserPool()
+    if http_session is None:
+        from http_client import client_session
+        http_session = client_session(fetch_scheduler.max_in_flight)
+    if retry_policy is None:
+        from retry_policy import RetryPolicy
+        retry_policy = RetryPolicy()
 
-allrugby_players = []
-rugbypass_players = []
-worldathletics_players = []
-sports247_players = []
-eurobasket_players = []
-proballers_players = []
 
+async def resolve_entities_while_stale():
+    global entity_index, entities_stale
+    loop = asyncio.get_running_loop()
+    while entities_stale:
+        entities_stale = False
+        try:
+            # the snapshots being served, so the entities' rows point into them
+            entity_index = await loop.run_in_executor(None, resolve_entities, dict(snapshots))
+        except Exception as e:
+            print(f"Entity resolution failed, keeping the previous entities: {e}")
 
-def load_players(path: str):
-    file_path = Path(path)
-    if file_path.exists():
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+
+def start_entity_resolution():
+    """
+    Re-resolve entities over the current snapshots in the background. One resolution
+    runs at a time (they share the entity id file), and snapshots swapped in while it
+    runs are picked up by one more run after it, so results are applied in order.
+    """
+    global entities_task, entities_stale
+    entities_stale = True
+    if entities_task is None or entities_task.done():
+        entities_task = asyncio.create_task(resolve_entities_while_stale())
+        background_tasks.add(entities_task)
+        entities_task.add_done_callback(background_tasks.discard)
+
+
+async def refresh_source(source: str):
+    """
+    Scrape `source` in the background and swap in the new snapshot once it is written.
+    Until then (or if the scrape fails) routes keep serving the previous one.
+    """
+    loop = asyncio.get_running_loop()
+    refreshing.add(source)
+    try:
+        print(f"Starting {source} scraping...")
+        # the first scrape of a source imports its scraper (and Selenium, aiohttp, bs4) off the event loop
+        scraper_class = await loop.run_in_executor(None, SOURCES[source].scraper_class)
+        scrape_resources()
+        scraper = scraper_class(*SOURCES[source].scraper_args,
+                                scheduler=fetch_scheduler, parse_pool=parse_pool, browser_pool=browser_pool,
+                                retry_policy=retry_policy)
+        await scraper.run_in_app(http_session)
+        listings[source] = await loop.run_in_executor(None, load_source, source)
+        print(f"{source} snapshot refreshed ({len(listings[source])} players).")
+        from http_client import connection_stats
+        print(connection_stats.report())
+        start_entity_resolution()
+    except Exception as e:
+        print(f"{source} scraping failed, keeping the previous snapshot: {e}")
+    finally:
+        refreshing.discard(source)
+
+
+def start_refresh(source: str):
+    if source in refreshing:
+        return
+    task = asyncio.create_task(refresh_source(source))
+    # keep a reference so the task is not garbage collected mid-run
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+for name, source in SOURCES.items():
+    if not source.scrapes:
+        listings[name] = load_source(name)
 
 
 @app.on_event("startup")
 async def startup_event():
-    global allrugby_players, rugbypass_players, worldathletics_players
-    
-    # AllRugby
-    if not allrugby_path.exists():
-        print("Starting AllRugby scraping...")
-        allrugby_scraper = AllRugbyScraper("united-states")
-        await allrugby_scraper.run_in_app()
-    else:
-        print("AllRugby JSON already exists, skipping scraping.")
-    allrugby_players = load_players(allrugby_path)
-
-    # RugbyPass
-    if not rugbypass_path.exists():
-        print("Starting RugbyPass scraping...")
-        rugbypass_scraper = RugbyPassScrapper("usa")
-        await rugbypass_scraper.run_in_app()
-    else:
-        print("RugbyPass JSON already exists, skipping scraping.")
-    rugbypass_players = load_players(rugbypass_path)
-
-    # WorldAthletics
-    if not worldathletics_path.exists():
-        print("Starting WorldAthletics scraping...")
-        worldathletics_scraper = WorldAthleticsScrapper()
-        await worldathletics_scraper.run_in_app()
-    else:
-        print("WorldAthletics JSON already exists, skipping scraping.")
-    worldathletics_players = load_players(worldathletics_path)
-
-
-sports247_players = load_players(sports247_path)
-eurobasket_players = load_players(eurobasket_path)
-proballers_players = load_players(proballers_path)
+    for name, source in SOURCES.items():
+        if not source.scrapes:
+            continue
+        if source.snapshot_path.exists():
+            listings[name] = load_source(name)
+        if REFRESH_ON_STARTUP or not source.snapshot_path.exists():
+            start_refresh(name)
+        else:
+            print(f"{name} JSON already exists, skipping scraping.")
+    # off the startup path, like the refreshes; /entities answers 404 until it is done
+    start_entity_resolution()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if http_session is not None:
+        await http_session.close()
+    parse_pool.shutdown()
+    if browser_pool is not None:
+        browser_pool.close()
+
+
+def render_template(template_name: str, context: Dict) -> HTMLResponse:
+    with metrics.TEMPLATE_RENDER_SECONDS.time(template=template_name):
+        return templates.TemplateResponse(template_name, context)
+
+
+def render_player_page(request: Request, source: str, template_name: str,
+                       page: int, page_size: int, sort: str, q: str) -> Response:
+    # the same URL over the same snapshot renders the same HTML (pager links are built from
+    # the full URL, hence it rather than just the query values), so it is rendered once
+    key = (template_name, snapshot_version(snapshots[source]), source in refreshing, str(request.url))
+    cached = page_cache.get(key)
+    if cached is None:
+        listing = listings[source]
+        result = listing.page(page, page_size, sort, q)
+        rendered = render_template(template_name, {
+            "request": request,
+            "players": result.items,
+            "pagination": result,
+            "sort_fields": listing.sort_fields,
+            "refreshing": source in refreshing,
+        })
+        cached = page_cache.put(key, rendered.body)
+    return cached.response(request)
+
+
+# endpoint function -> route path, e.g. "/entities/{entity_id}", for the latency labels
+route_paths = {}
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    if not route_paths:
+        route_paths.update({route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")})
+    # label by route rather than URL, so /entities/<id> doesn't make a series per player
+    route = route_paths.get(request.scope.get("endpoint"), "unmatched")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start, method=request.method, route=route, status=response.status_code)
+    return response
+
+
+@app.get("/metrics")
+async def read_metrics():
+    for source, players in snapshots.items():
+        metrics.SNAPSHOT_PLAYERS.set(len(players), source=source)
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    return templates.TemplateResponse("home.html", {"request": request})
+    return render_template("home.html", {"request": request})
+
+
+@app.get("/search", response_class=HTMLResponse)
+async def search_players(request: Request, q: str = None, limit: int = DEFAULT_LIMIT):
+    start = time.perf_counter()
+    hits = search_index.search(q, limit) if q else []
+    return render_template("search.html", {
+        "request": request,
+        "q": q or "",
+        "hits": hits,
+        "entity_of": lambda source, row: entity_index.current_entity((source, row), snapshots),
+        "indexed": len(search_index),
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+    })
+
+
+@app.get("/entities/{entity_id}")
+async def read_entity(entity_id: str):
+    # members in a snapshot swapped since the last resolution would point at other players
+    members = entity_index.current_members(entity_id, snapshots)
+    if not members:
+        raise HTTPException(status_code=404, detail="Unknown player id")
+    return {
+        "id": entity_id,
+        "name": entity_index.names[entity_id],
+        "records": [
+            {"source": source, "row": row, "player": snapshots[source][row]}
+            for source, row in members
+        ],
+    }
+
+
+def api_snapshot(source: str):
+    if source not in snapshots:
+        raise HTTPException(status_code=404, detail=f"Unknown source '{source}'")
+    return snapshots[source]
+
+
+@app.get("/api/{source}/players")
+async def api_players(source: str, cursor: str = None, limit: int = DEFAULT_API_LIMIT, sort: str = None,
+                      fields: str = None, format: str = "json"):
+    players = api_snapshot(source)
+    try:
+        body, next_cursor = player_api.page(source, players, cursor, limit, sort, parse_fields(fields), format)
+    except StaleCursor as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ApiError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return Response(content=body, media_type=FORMATS[format], headers=headers)
 
 
-@app.get("/allrugby", response_class=HTMLResponse)
-async def read_players(request: Request):
-    return templates.TemplateResponse("allrugby_player_list.html", {"request": request, "players": allrugby_players})
+@app.get("/api/{source}/export")
+async def api_export(source: str, sort: str = None, fields: str = None, format: str = "ndjson"):
+    players = api_snapshot(source)
+    try:
+        chunks = player_api.export(source, players, sort, parse_fields(fields), format)
+    except ApiError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(chunks, media_type=FORMATS[format],
+                             headers={"Content-Disposition": f'attachment; filename="{source}.{format}"'})
 
 
-@app.get("/rugbypass", response_class=HTMLResponse)
-async def read_players(request: Request):
-    return templates.TemplateResponse("rugbypass_player_list.html", {"request": request, "players": rugbypass_players})
+@app.get("/api/{source}/stats")
+async def api_stats(source: str):
+    api_snapshot(source)
+    return aggregates[source].stats()
 
 
-@app.get("/worldathletics", response_class=HTMLResponse)
-async def read_players(request: Request):
-    return templates.TemplateResponse("worldathletics_player_list.html", {"request": request, "players": worldathletics_players})
+@app.get("/api/{source}/leaderboard/{field}")
+async def api_leaderboard(source: str, field: str, limit: int = DEFAULT_TOP):
+    api_snapshot(source)
+    leaders = aggregates[source].leaderboard(field, limit)
+    if leaders is None:
+        raise HTTPException(status_code=404, detail=f"{source} has no numeric field '{field}'")
+    return {"source": source, "field": field, "players": leaders}
 
 
-@app.get("/247sports", response_class=HTMLResponse)
-async def read_players(request: Request):
-    return templates.TemplateResponse("247sports_player_list.html", {"request": request, "players": sports247_players})
+@app.get("/api/{source}/groups/{group}")
+async def api_group_averages(source: str, group: str, sort: str = None, min_players: int = 1):
+    api_snapshot(source)
+    groups = aggregates[source].group_averages(group, sort, min_players)
+    if groups is None:
+        raise HTTPException(status_code=404, detail=f"{source} can't be grouped by '{group}'")
+    return {"source": source, "group": group, "groups": groups}
 
 
-@app.get("/eurobasket", response_class=HTMLResponse)
-async def read_players(request: Request):
-    return templates.TemplateResponse("eurobasket_player_list.html", {"request": request, "players": eurobasket_players})
+def player_page(source: Source):
+    async def read_players(request: Request, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE,
+                           sort: str = None, q: str = None):
+        return render_player_page(request, source.name, source.template, page, page_size, sort, q)
+    return read_players
 
 
-@app.get("/proballers", response_class=HTMLResponse)
-async def read_players(request: Request):
-    return templates.TemplateResponse("proballers_player_list.html", {"request": request, "players": proballers_players})
+# one list page per registered source: /allrugby, /rugbypass, ...
+for source in SOURCES.values():
+    app.add_api_route(source.route, player_page(source), methods=["GET"], response_class=HTMLResponse,
+                      name=f"read_{source.name}_players")
@@ -0,0 +1,189 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+
+# seconds; spans a cache hit on a route up to a slow profile page
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+
+    def _key(self, labels: Dict) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}", *self.samples()]
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (count per bucket, not cumulative; the last one is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(counts), total[0]) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = _format_labels((*self.labels, "le"), (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    The process's metrics, rendered in the Prometheus text format. Each app worker
+    process has its own registry, so scrape every worker (or run a single one).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# scrapers
+DISCOVERY_SECONDS = REGISTRY.register(Histogram(
+    "scraper_discovery_seconds", "Time to discover a source's player list.", ["source"]))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "scraper_request_seconds", "Profile request time until the response headers arrived.", ["source", "status"]))
+RESPONSE_BYTES = REGISTRY.register(Counter(
+    "scraper_response_bytes_total", "Profile page bytes received (after content decoding).", ["source"]))
+RETRIES = REGISTRY.register(Counter(
+    "scraper_retries_total", "Profile fetch attempts that failed and were retried, by failure kind.",
+    ["source", "failure"]))
+SHORT_CIRCUITED = REGISTRY.register(Counter(
+    "scraper_short_circuited_total", "Profile fetches failed at once because the host's circuit breaker was open.",
+    ["source"]))
+CIRCUITS_OPENED = REGISTRY.register(Counter(
+    "scraper_circuits_opened_total", "Times a host's circuit breaker opened.", ["host"]))
+PARSE_SECONDS = REGISTRY.register(Histogram(
+    "scraper_parse_seconds", "Time to parse one profile page, including the hop to a parse worker.", ["source"]))
+PROFILES = REGISTRY.register(Counter(
+    "scraper_profiles_total", "Profiles fetched, by result: ok, unchanged (304) or error.", ["source", "result"]))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "scraper_http_requests_total", "Scraper HTTP requests, by result: ok (a response came back) or failed.",
+    ["result"]))
+HTTP_CONNECTIONS = REGISTRY.register(Counter(
+    "scraper_http_connections_total", "Connections scraper requests went out on: new (TCP + TLS handshake) "
+    "or reused (idle keep-alive).", ["connection"]))
+DNS_LOOKUPS = REGISTRY.register(Counter(
+    "scraper_dns_lookups_total", "Scraper DNS lookups, by whether the connector's DNS cache answered: hit or miss.",
+    ["result"]))
+
+# web app
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_seconds", "App request latency by route.", ["method", "route", "status"]))
+TEMPLATE_RENDER_SECONDS = REGISTRY.register(Histogram(
+    "template_render_seconds", "Jinja template render time.", ["template"]))
+SNAPSHOT_PLAYERS = REGISTRY.register(Gauge(
+    "snapshot_players", "Players in the snapshot a source is currently served from.", ["source"]))
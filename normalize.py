@@ -0,0 +1,164 @@
+import math
+import re
+from array import array
+from datetime import date, datetime
+from typing import Callable, Dict, List
+
+
+MISSING = float("nan")
+
+# per-game averages, e.g. proballers' game_stats
+STAT_FIELDS = ("points", "rebounds", "assists", "steals", "blocks")
+# unified numeric fields every source is normalized into
+FIELDS = ("height_cm", "weight_kg", "age", "birthdate", *STAT_FIELDS)
+
+# unified field -> (key in the source's player dict, how to read it): the unit of a bare
+# number for height / weight, a strptime format (or "bio") for birthdates. Keys of a
+# nested dict are written "parent.child", e.g. "game_stats.points".
+SOURCE_FIELDS = {
+    "allrugby": {"height_cm": ("height_m", "m"), "weight_kg": ("weight_kg", "kg"), "age": ("age", None)},
+    "rugbypass": {"height_cm": ("height", "cm"), "weight_kg": ("weight", "kg"), "age": ("age", None)},
+    "worldathletics": {"age": ("age", None), "birthdate": ("birthdate", "%d %b %Y")},
+    "247sports": {"height_cm": ("Height", "in"), "weight_kg": ("Weight", "lb")},
+    "eurobasket": {"height_cm": ("Height", "cm"), "age": ("Age", None), "birthdate": ("Bio", "bio")},
+    "proballers": {
+        "height_cm": ("Height", "m"), "age": ("Age", None), "birthdate": ("Date-of-birth", "%b %d, %Y"),
+        **{stat: (f"game_stats.{stat}", None) for stat in STAT_FIELDS},
+    },
+}
+
+TO_CM = {"m": 100.0, "cm": 1.0, "in": 2.54}
+TO_KG = {"kg": 1.0, "lb": 0.45359237}
+
+METRIC_SPLIT = re.compile(r"(\d)\s*m\s*(\d{2})\b")             # 2m06
+WITH_UNIT = re.compile(r"(\d+(?:\.\d+)?)\s*(cm|m|kg|kgs|lbs?)\b")  # 185cm, 1.85 m, 105kg, 230 lbs
+FEET_INCHES = re.compile(r"(\d)\s*(?:'|ft|-)\s*(\d{1,2})")      # 6-9, 6'9", 6 ft 9
+BORN_ON = re.compile(r"born on (\w+ \d{1,2},? \d{4})")
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def _in_range(value: float, low: float, high: float) -> float:
+    return value if low <= value <= high else MISSING
+
+
+def parse_height_cm(value, unit: str = "cm") -> float:
+    if isinstance(value, (int, float)):
+        return _in_range(value * TO_CM.get(unit, 1.0), 120, 250)
+    text = str(value or "").lower()
+
+    match = METRIC_SPLIT.search(text)
+    if match:
+        return _in_range(int(match.group(1)) * 100 + int(match.group(2)), 120, 250)
+    match = WITH_UNIT.search(text)
+    if match and match.group(2) in ("cm", "m"):
+        return _in_range(float(match.group(1)) * TO_CM[match.group(2)], 120, 250)
+    match = FEET_INCHES.search(text)
+    if match:
+        return _in_range((int(match.group(1)) * 12 + int(match.group(2))) * 2.54, 120, 250)
+    return _in_range(_number(text) * TO_CM.get(unit, 1.0), 120, 250)
+
+
+def parse_weight_kg(value, unit: str = "kg") -> float:
+    if isinstance(value, (int, float)):
+        return _in_range(value * TO_KG.get(unit, 1.0), 35, 200)
+    text = str(value or "").lower()
+
+    match = WITH_UNIT.search(text)
+    if match and match.group(2) not in ("cm", "m"):
+        factor = TO_KG["kg"] if match.group(2).startswith("kg") else TO_KG["lb"]
+        return _in_range(float(match.group(1)) * factor, 35, 200)
+    return _in_range(_number(text) * TO_KG.get(unit, 1.0), 35, 200)
+
+
+def parse_birthdate(value, fmt: str) -> float:
+    """
+    Date ordinal (days since 0001-01-01) as a float, so it fits the float columns.
+    """
+    text = str(value or "").strip()
+    if fmt == "bio":
+        match = BORN_ON.search(text)
+        if not match:
+            return MISSING
+        text = match.group(1).replace(",", "")
+        fmt = "%B %d %Y"
+    try:
+        return float(datetime.strptime(text, fmt).date().toordinal())
+    except ValueError:
+        return MISSING
+
+
+def parse_age(value, unit: str = None) -> float:
+    return _in_range(_number(value), 10, 60)
+
+
+def parse_stat(value, unit: str = None) -> float:
+    return _in_range(_number(value), 0, 100)
+
+
+PARSERS: Dict[str, Callable] = {
+    "height_cm": parse_height_cm,
+    "weight_kg": parse_weight_kg,
+    "age": parse_age,
+    "birthdate": parse_birthdate,
+    **{stat: parse_stat for stat in STAT_FIELDS},
+}
+
+
+def _parse_column(values: List, parser: Callable, hint) -> array:
+    # rosters repeat the same few heights / weights / ages, so each distinct raw value is parsed once
+    parsed = {}
+    column = array("d")
+    for value in values:
+        key = (type(value), value)
+        if key not in parsed:
+            parsed[key] = parser(value, hint)
+        column.append(parsed[key])
+    return column
+
+
+def age_on(birthdate_ordinals: array, today: date = None) -> array:
+    today = today or date.today()
+    ages = array("d")
+    for ordinal in birthdate_ordinals:
+        if math.isnan(ordinal):
+            ages.append(MISSING)
+            continue
+        born = date.fromordinal(int(ordinal))
+        ages.append(today.year - born.year - ((today.month, today.day) < (born.month, born.day)))
+    return ages
+
+
+def normalize_columns(source: str, raw_columns: Dict[str, List], count: int) -> Dict[str, array]:
+    """
+    Typed float64 columns (NaN = missing) for `source`, from its raw per-key value
+    lists. Ages missing from the source are derived from the birthdate column.
+    """
+    columns = {}
+    for field, (key, hint) in SOURCE_FIELDS.get(source, {}).items():
+        values = raw_columns.get(key) or [None] * count
+        columns[field] = _parse_column(values, PARSERS[field], hint)
+
+    if "birthdate" in columns:
+        derived = age_on(columns["birthdate"])
+        ages = columns.get("age") or array("d", [MISSING]) * count
+        columns["age"] = array("d", (a if not math.isnan(a) else d for a, d in zip(ages, derived)))
+    return columns
+
+
+def display_value(field: str, value: float):
+    """
+    Python value to put in a player dict for one normalized cell, or None if missing.
+    """
+    if math.isnan(value):
+        return None
+    if field == "birthdate":
+        return date.fromordinal(int(value)).isoformat()
+    if field == "age":
+        return int(value)
+    return round(value, 1)
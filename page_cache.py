@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from decouple import config
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+# rendered pages kept in memory; keys include the snapshot version, so a scrape makes the old ones unreachable
+PAGE_CACHE_SIZE = config("PAGE_CACHE_SIZE", default=512, cast=int)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip; "gzip;q=0" refuses it.
+    """
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0))) > 0
+
+
+class NegotiatingGZipMiddleware(GZipMiddleware):
+    """
+    Starlette's GZipMiddleware, minus gzip for clients that refuse it: it only looks
+    for "gzip" in Accept-Encoding, so "gzip;q=0" would still get a gzip body.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not accepts_gzip(Headers(scope=scope).get("accept-encoding", "")):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class CachedPage:
+    """
+    One rendered page: the HTML, its gzip-compressed copy and a strong ETag for
+    each (a strong validator differs between content-codings), all computed once.
+    """
+
+    def __init__(self, body: bytes, media_type: str = "text/html; charset=utf-8"):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        self.media_type = media_type
+        digest = hashlib.sha1(body).hexdigest()
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+    def matches(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # If-None-Match compares weakly: a W/ prefix added by a proxy still counts, and so
+        # does the other coding's tag, since both stand for the same page
+        return "*" in tags or any(tag.removeprefix("W/") in (self.etag, self.gzip_etag) for tag in tags)
+
+
+    def response(self, request: Request) -> Response:
+        # no-cache: browsers keep the page but revalidate, which costs a 304 until the next scrape
+        gzipped = accepts_gzip(request.headers.get("accept-encoding", ""))
+        headers = {"ETag": self.gzip_etag if gzipped else self.etag,
+                   "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if self.matches(request):
+            return Response(status_code=304, headers=headers)
+        if gzipped:
+            # already compressed, so the compression middleware passes it through untouched
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.gzipped, media_type=self.media_type, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
+
+
+class PageCache:
+    """
+    LRU of rendered pages by route and query. Callers put the source's snapshot
+    version in the key, so nothing needs to be evicted explicitly when a scrape
+    swaps in a new snapshot.
+    """
+
+    def __init__(self, size: int = None):
+        self.size = PAGE_CACHE_SIZE if size is None else size
+        self._pages: "OrderedDict[Hashable, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, key: Hashable) -> Optional[CachedPage]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+
+    def put(self, key: Hashable, body: bytes) -> CachedPage:
+        page = CachedPage(body)
+        with self._lock:
+            self._pages[key] = page
+            while len(self._pages) > self.size:
+                self._pages.popitem(last=False)
+        return page
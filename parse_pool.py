@@ -0,0 +1,41 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from decouple import config
+
+
+class ParsePool:
+    """
+    Runs CPU-bound HTML parsing in worker processes so the event loop keeps downloading
+    (and, inside the app, keeps serving requests) while pages are being parsed.
+
+    `func` must be a module-level function so it can be pickled to the workers.
+    With PARSE_WORKERS=0 parsing runs inline on the event loop, as before.
+    """
+
+    WORKERS = config("PARSE_WORKERS", default=os.cpu_count() or 1, cast=int)
+
+    def __init__(self, workers: int = None):
+        self.workers = self.WORKERS if workers is None else workers
+        self._executor = None
+
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+
+    async def parse(self, func: Callable, *args):
+        if self.workers <= 0:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,162 @@
+import base64
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from decouple import config
+
+
+DEFAULT_API_LIMIT = 100
+MAX_API_LIMIT = 1000
+# serialized pages kept in memory, across all sources; entries of an old snapshot simply age out
+API_PAGE_CACHE_SIZE = config("API_PAGE_CACHE_SIZE", default=256, cast=int)
+# records serialized per chunk of a streamed export
+EXPORT_CHUNK_SIZE = 500
+
+FORMATS = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+class ApiError(ValueError):
+    pass
+
+
+class StaleCursor(ApiError):
+    pass
+
+
+def snapshot_version(players: Sequence) -> str:
+    return getattr(players, "version", "empty")
+
+
+def encode_cursor(version: str, sort: Optional[str], position: int) -> str:
+    raw = json.dumps([version, sort, position], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Optional[str], int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        version, sort, position = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ApiError(f"Invalid cursor: {e}")
+    # a negative position would make an empty page whose next cursor is itself
+    if not isinstance(position, int) or isinstance(position, bool) or position < 0:
+        raise ApiError("Invalid cursor: bad position")
+    if sort is not None and not isinstance(sort, str):
+        raise ApiError("Invalid cursor: bad sort")
+    return str(version), sort, position
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    return tuple(field.strip() for field in (fields or "").split(",") if field.strip())
+
+
+def _select(record: Dict, fields: Tuple[str, ...]) -> Dict:
+    if not fields:
+        return record
+    return {field: record.get(field) for field in fields}
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+class PlayerApi:
+    """
+    JSON / NDJSON views of the source snapshots.
+
+    Pages are addressed by an opaque cursor (snapshot version, sort, position in
+    that sort order), so paging stays consistent while a scrape swaps in a new
+    snapshot: an old cursor is rejected instead of silently skipping or repeating
+    players. Serialized pages are cached by snapshot version, so a popular page
+    is encoded once per scrape rather than once per request.
+    """
+
+    def __init__(self, sort_fields: Dict[str, Dict[str, str]], cache_size: int = None):
+        self.sort_fields = sort_fields
+        self.cache_size = API_PAGE_CACHE_SIZE if cache_size is None else cache_size
+        self._pages: "OrderedDict[tuple, Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def _order(self, source: str, players: Sequence, sort: Optional[str]) -> Sequence[int]:
+        if not sort:
+            return range(len(players))
+        name = sort.lstrip("-")
+        key = self.sort_fields.get(source, {}).get(name)
+        if key is None:
+            raise ApiError(f"Unknown sort '{sort}' for {source}")
+        if not hasattr(players, "sort_order"):
+            return range(len(players))
+        ascending, descending = players.sort_order(key)
+        return descending if sort.startswith("-") else ascending
+
+
+    def page(self, source: str, players: Sequence, cursor: str = None, limit: int = DEFAULT_API_LIMIT,
+             sort: str = None, fields: Tuple[str, ...] = (), fmt: str = "json") -> Tuple[bytes, Optional[str]]:
+        """
+        One serialized page and the cursor of the next one (None on the last page).
+        """
+        if fmt not in FORMATS:
+            raise ApiError(f"Unknown format '{fmt}', expected one of {tuple(FORMATS)}")
+        limit = min(max(1, limit), MAX_API_LIMIT)
+        version = snapshot_version(players)
+        position = 0
+        if cursor:
+            cursor_version, sort, position = decode_cursor(cursor)
+            if cursor_version != version:
+                raise StaleCursor("The player list changed since this cursor was issued; start again without a cursor")
+
+        key = (source, version, sort, position, limit, fields, fmt)
+        with self._lock:
+            if key in self._pages:
+                self._pages.move_to_end(key)
+                return self._pages[key]
+
+        order = self._order(source, players, sort)
+        if position > len(order):
+            raise ApiError("Invalid cursor: position is past the end of the list")
+        rows = order[position:position + limit]
+        records = [_select(players[row], fields) for row in rows]
+        end = position + len(records)
+        next_cursor = encode_cursor(version, sort, end) if end < len(order) else None
+
+        if fmt == "ndjson":
+            body = "".join(_dumps(record) + "\n" for record in records)
+        else:
+            body = _dumps({"source": source, "version": version, "total": len(players),
+                           "players": records, "next_cursor": next_cursor})
+        result = (body.encode("utf-8"), next_cursor)
+
+        with self._lock:
+            self._pages[key] = result
+            while len(self._pages) > self.cache_size:
+                self._pages.popitem(last=False)
+        return result
+
+
+    def export(self, source: str, players: Sequence, sort: str = None, fields: Tuple[str, ...] = (),
+               fmt: str = "ndjson") -> Iterator[bytes]:
+        """
+        Every player, serialized in chunks as the response is sent. The generator
+        holds on to `players`, so an export started before a refresh finishes on the
+        snapshot it started with.
+        """
+        if fmt not in FORMATS:
+            raise ApiError(f"Unknown format '{fmt}', expected one of {tuple(FORMATS)}")
+        order = self._order(source, players, sort)
+
+        def chunks() -> Iterator[bytes]:
+            if fmt == "json":
+                yield b"["
+            for start in range(0, len(order), EXPORT_CHUNK_SIZE):
+                lines: List[str] = [_dumps(_select(players[row], fields)) for row in order[start:start + EXPORT_CHUNK_SIZE]]
+                if fmt == "json":
+                    yield (("," if start else "") + ",".join(lines)).encode("utf-8")
+                else:
+                    yield "".join(line + "\n" for line in lines).encode("utf-8")
+            if fmt == "json":
+                yield b"]"
+
+        return chunks()
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+QUERY_CACHE_SIZE = 32
+
+
+def sort_key(value):
+    """
+    Order numbers numerically, everything else case-insensitively, missing values last.
+    """
+    if value is None or value == "":
+        return (2, 0.0, "")
+    if isinstance(value, (int, float)):
+        return (0, float(value), "")
+    text = str(value).strip()
+    try:
+        return (0, float(text), "")
+    except ValueError:
+        return (1, 0.0, text.lower())
+
+
+def sort_orders(values: Sequence) -> Tuple[List[int], List[int]]:
+    """
+    Ascending and descending row orders for one column, missing values last in both.
+    """
+    keys = [sort_key(value) for value in values]
+    ascending = sorted(range(len(keys)), key=keys.__getitem__)
+    # descending keeps missing values at the end as well
+    missing = sum(1 for k in keys if k[0] == 2)
+    present = len(ascending) - missing
+    descending = ascending[present - 1::-1] + ascending[present:] if present else ascending
+    return ascending, descending
+
+
+def _search_text(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(item) for item in value)
+    return str(value or "")
+
+
+class Page:
+
+    def __init__(self, items: List[Dict], page: int, page_size: int, total: int, sort: str = None, q: str = None):
+        self.items = items
+        self.page = page
+        self.page_size = page_size
+        self.total = total
+        self.sort = sort
+        self.q = q
+        self.offset = (page - 1) * page_size
+        self.total_pages = max(1, -(-total // page_size))
+
+
+    @property
+    def has_previous(self) -> bool:
+        return self.page > 1
+
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.total_pages
+
+
+    def page_range(self, window: int = 2) -> List[Optional[int]]:
+        """
+        Page numbers to show in the pager; None marks an ellipsis.
+        e.g. [1, None, 4, 5, 6, 7, 8, None, 20]
+        """
+        start = max(1, self.page - window)
+        end = min(self.total_pages, self.page + window)
+        pages = list(range(start, end + 1))
+        if start > 1:
+            pages = [1] + ([None] if start > 2 else []) + pages
+        if end < self.total_pages:
+            pages = pages + ([None] if end < self.total_pages - 1 else []) + [self.total_pages]
+        return pages
+
+
+class PlayerListing:
+    """
+    Read-only view over a loaded player list that serves one page at a time.
+
+    Sort orders are computed once per field when the listing is built (or read
+    from a Snapshot), so serving a page only touches the rows on that page. Search results are
+    cached per (q, sort) so paging through a filtered result stays cheap too.
+    """
+
+    def __init__(self, players: Sequence[Dict], sort_fields: Dict[str, str] = None, search_fields: List[str] = None):
+        self.players = players
+        # public sort name -> key in the player dict, e.g. {"age": "Age"}
+        self.sort_fields = sort_fields or {}
+        self.search_fields = search_fields or []
+
+        self._orders = {}
+        for name, key in self.sort_fields.items():
+            # a Snapshot ships its orders precomputed; plain lists are sorted here
+            if hasattr(players, "sort_order"):
+                ascending, descending = players.sort_order(key)
+            else:
+                ascending, descending = sort_orders([player.get(key) for player in players])
+            self._orders[name] = ascending
+            self._orders[f"-{name}"] = descending
+        self._haystacks = None
+        self._query_cache = OrderedDict()
+
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+
+    def _ordered_indexes(self, sort: str = None) -> Sequence[int]:
+        if not sort:
+            return range(len(self.players))
+        return self._orders.get(sort, range(len(self.players)))
+
+
+    def _filtered_indexes(self, q: str, sort: str = None) -> List[int]:
+        cache_key = (q, sort)
+        if cache_key in self._query_cache:
+            self._query_cache.move_to_end(cache_key)
+            return self._query_cache[cache_key]
+
+        if self._haystacks is None:
+            # built on the first search, so opening a lazily read snapshot stays cheap
+            self._haystacks = [
+                " ".join(_search_text(player.get(field)) for field in self.search_fields).lower()
+                for player in self.players
+            ]
+
+        terms = q.lower().split()
+        indexes = [
+            i for i in self._ordered_indexes(sort)
+            if all(term in self._haystacks[i] for term in terms)
+        ]
+
+        self._query_cache[cache_key] = indexes
+        if len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return indexes
+
+
+    def page(self, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE, sort: str = None, q: str = None) -> Page:
+        page_size = min(max(1, page_size), MAX_PAGE_SIZE)
+        if sort not in self._orders:
+            sort = None
+        q = (q or "").strip() or None
+
+        indexes = self._filtered_indexes(q, sort) if q and self.search_fields else self._ordered_indexes(sort)
+        total = len(indexes)
+        total_pages = max(1, -(-total // page_size))
+        page = min(max(1, page), total_pages)
+
+        offset = (page - 1) * page_size
+        items = [self.players[i] for i in indexes[offset:offset + page_size]]
+        return Page(items, page, page_size, total, sort, q)
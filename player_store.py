@@ -0,0 +1,240 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from decouple import config
+
+from player_listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, Page, sort_key
+from snapshot import open_snapshot, snapshot_path_for
+
+
+PLAYER_DB_PATH = config("PLAYER_DB_PATH", default="players.sqlite3")
+
+# indexed store column -> key in each source's player dict
+COLUMNS = {
+    "allrugby": {"name": "name", "age": "age"},
+    "rugbypass": {"name": "name", "age": "age", "position": "position"},
+    "worldathletics": {"name": "name", "age": "age", "country": "country"},
+    "247sports": {"name": "Player Name", "position": "POS"},
+    "eurobasket": {"name": "Player Name", "team": "Team Name", "country": "Nationality", "age": "age", "position": "Pos"},
+    "proballers": {"name": "Basketball Player", "team": "Basketball Team", "country": "Home Country", "age": "age"},
+}
+INDEXED = ("name", "team", "country", "age", "position")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    source TEXT NOT NULL,
+    player_key TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    name TEXT,
+    team TEXT,
+    country TEXT,
+    age REAL,
+    position TEXT,
+    data TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    PRIMARY KEY (source, player_key)
+);
+CREATE INDEX IF NOT EXISTS players_row ON players (source, row);
+CREATE INDEX IF NOT EXISTS players_name ON players (source, name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS players_team ON players (source, team COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS players_country ON players (source, country COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS players_age ON players (source, age);
+CREATE INDEX IF NOT EXISTS players_position ON players (source, position COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    snapshot_mtime REAL NOT NULL,
+    generation INTEGER NOT NULL,
+    players INTEGER NOT NULL
+);
+"""
+
+UPSERT = """
+INSERT INTO players (source, player_key, row, name, team, country, age, position, data, generation)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (source, player_key) DO UPDATE SET
+    row = excluded.row, name = excluded.name, team = excluded.team, country = excluded.country,
+    age = excluded.age, position = excluded.position, data = excluded.data, generation = excluded.generation
+"""
+
+
+def _text(value) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    return str(value).strip()
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PlayerStore:
+    """
+    SQLite copy of every source's players, in WAL mode so any number of app workers
+    can read while one of them imports a fresh snapshot.
+
+    Each source keeps the full player dict as JSON plus a few indexed columns
+    (name, team, country, age, position), so default-order pages and sorts on those
+    columns are index scans instead of walks over an in-memory list.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or PLAYER_DB_PATH
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per thread: routes read on the event loop, imports run in executors
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function("sort_rank", 1, lambda v: sort_key(v)[0], deterministic=True)
+            conn.create_function("sort_number", 1, lambda v: sort_key(v)[1], deterministic=True)
+            conn.create_function("sort_text", 1, lambda v: sort_key(v)[2], deterministic=True)
+            self._local.conn = conn
+        return conn
+
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+    def _rows(self, source: str, players: Iterable[Dict], generation: int):
+        columns = COLUMNS.get(source, {})
+        seen = set()
+        for row, player in enumerate(players):
+            values = {column: player.get(key) for column, key in columns.items()}
+            key = player.get("profile_url") or _text(values.get("name")) or str(row)
+            if key in seen:
+                key = f"{key}#{row}"  # namesakes without a profile URL
+            seen.add(key)
+            yield (
+                source, key, row,
+                _text(values.get("name")), _text(values.get("team")), _text(values.get("country")),
+                _number(values.get("age")), _text(values.get("position")),
+                json.dumps(player, ensure_ascii=False), generation,
+            )
+
+
+    def import_snapshot(self, source: str, json_path) -> bool:
+        """
+        Upsert `source`'s players from its snapshot and drop players that are no longer
+        in it. Does nothing if this snapshot was already imported. Returns True if it imported.
+        """
+        players = open_snapshot(json_path, source)
+        snap_path = snapshot_path_for(json_path)
+        if not os.path.exists(snap_path):
+            return False
+        mtime = os.path.getmtime(snap_path)
+
+        with self._transaction() as conn:
+            current = conn.execute(
+                "SELECT snapshot_mtime, generation FROM sources WHERE source = ?", (source,)).fetchone()
+            if current and current[0] >= mtime:
+                return False
+            generation = current[1] + 1 if current else 1
+
+            conn.executemany(UPSERT, self._rows(source, players, generation))
+            conn.execute("DELETE FROM players WHERE source = ? AND generation < ?", (source, generation))
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (source, snapshot_mtime, generation, players) VALUES (?, ?, ?, ?)",
+                (source, mtime, generation, len(players)))
+        # refresh the planner's statistics so it picks the per-column indexes
+        self._connect().execute("PRAGMA optimize")
+        print(f"{source}: imported {len(players)} players into {self.path}")
+        return True
+
+
+    def count(self, source: str, where: List[str] = (), params: List = ()) -> int:
+        sql_where = " AND ".join(["source = ?", *where])
+        return self._connect().execute(
+            f"SELECT count(*) FROM players WHERE {sql_where}", [source, *params]).fetchone()[0]
+
+
+    def query(self, source: str, where: List[str], params: List, order_by: str, limit: int, offset: int) -> List[Dict]:
+        sql_where = " AND ".join(["source = ?", *where])
+        rows = self._connect().execute(
+            f"SELECT data FROM players WHERE {sql_where} ORDER BY {order_by} LIMIT ? OFFSET ?",
+            [source, *params, limit, offset]).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+
+class StoreListing:
+    """
+    Same interface as PlayerListing, answered by PlayerStore queries instead of
+    in-memory lists.
+    """
+
+    def __init__(self, store: PlayerStore, source: str, sort_fields: Dict[str, str] = None,
+                 search_fields: List[str] = None):
+        self.store = store
+        self.source = source
+        self.sort_fields = sort_fields or {}
+        self.search_fields = search_fields or []
+
+        indexed_keys = {key: column for column, key in COLUMNS.get(source, {}).items() if column in INDEXED}
+        self._orders = {}
+        for name, key in self.sort_fields.items():
+            column = indexed_keys.get(key)
+            if column == "age":
+                expression = "age"
+            elif column:
+                expression = f"{column} COLLATE NOCASE"
+            else:
+                # same ordering as PlayerListing: numbers, then text, then missing
+                value = f"json_extract(data, '$.\"{key}\"')"
+                self._orders[name] = f"sort_rank({value}), sort_number({value}), sort_text({value}), row"
+                self._orders[f"-{name}"] = (
+                    f"sort_rank({value}) = 2, sort_rank({value}) DESC, sort_number({value}) DESC, "
+                    f"sort_text({value}) DESC, row DESC")
+                continue
+            self._orders[name] = f"{column} IS NULL, {expression}, row"
+            self._orders[f"-{name}"] = f"{column} IS NULL, {expression} DESC, row DESC"
+
+        self._haystack = " || ' ' || ".join(
+            f"coalesce(json_extract(data, '$.\"{field}\"'), '')" for field in self.search_fields
+        )
+
+
+    def __len__(self) -> int:
+        return self.store.count(self.source)
+
+
+    def page(self, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE, sort: str = None, q: str = None) -> Page:
+        page_size = min(max(1, page_size), MAX_PAGE_SIZE)
+        if sort not in self._orders:
+            sort = None
+        q = (q or "").strip() or None
+
+        where, params = [], []
+        if q and self.search_fields:
+            for term in q.lower().split():
+                escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                where.append(f"lower({self._haystack}) LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+
+        order_by = self._orders[sort] if sort else "row"
+        total = self.store.count(self.source, where, params)
+        total_pages = max(1, -(-total // page_size))
+        page = min(max(1, page), total_pages)
+        items = self.store.query(self.source, where, params, order_by, page_size, (page - 1) * page_size)
+        return Page(items, page, page_size, total, sort, q)
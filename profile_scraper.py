@@ -0,0 +1,275 @@
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Dict, Optional
+
+import aiohttp
+from decouple import config
+
+import metrics
+from browser_pool import BrowserPool
+from fetch_cache import FetchCache
+from fetch_scheduler import FetchScheduler
+from http_client import client_session
+from parse_pool import ParsePool
+from profile_stream import ProfileStream
+from retry_policy import HttpStatusError, RetryPolicy
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/123.0 Safari/537.36"
+)
+
+
+class ProfileScraper:
+    """
+    Discovery, profile fetching and the resumable run every scraper shares.
+
+    A subclass sets SOURCE, URL_FIELD (the key of a roster entry holding its relative
+    profile URL) and is_error_record, and implements fetch_roster (HTTP discovery),
+    scrape_players (browser discovery), _profile_url and _fetch_profile.
+    """
+
+    SOURCE = ""
+    URL_FIELD = ""
+
+    def __init__(self, url_log_path: str = None, data_log_path: str = None,
+                 scheduler: FetchScheduler = None, parse_pool: ParsePool = None,
+                 browser_pool: BrowserPool = None, retry_policy: RetryPolicy = None):
+        # subclasses read their required settings (base URLs, RETRY_LIMIT) when created too, so a
+        # missing one fails that scrape instead of every import of the module
+        # "auto": HTTP discovery first, headless browser if that finds nothing; or "http" / "browser" only
+        self.discovery_mode = config("DISCOVERY_MODE", default="auto")
+        # an HTTP roster shorter than this share of the last run's is taken as cut short (see discover_players)
+        self.roster_min_share = config("ROSTER_MIN_SHARE", default=0.8, cast=float)
+        self.scheduler = scheduler or FetchScheduler()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.parse_pool = parse_pool or ParsePool()
+        # a scraper used on its own gets a single browser it closes after discovery
+        self.browser_pool = browser_pool or BrowserPool(size=1)
+        self._owns_browser_pool = browser_pool is None
+
+        log_dir = f"logs_{self.SOURCE}"
+        self.url_log_file_path = url_log_path or self._create_log_file_path(log_dir, "player_profile_urls.json")
+        self.player_data_log_file_path = data_log_path or self._create_log_file_path(log_dir, "player_data.json")
+        # kept next to the data file, so batch jobs for different countries don't share one cache file
+        self.fetch_cache = FetchCache(os.path.join(os.path.dirname(self.player_data_log_file_path), "fetch_cache.json"),
+                                      self.player_data_log_file_path, self.SOURCE)
+        # profiles land here as they are fetched and are compacted into player_data.json at the end
+        self.profile_stream = ProfileStream(os.path.splitext(self.player_data_log_file_path)[0] + ".ndjson")
+
+
+    def _create_log_file_path(self, log_dir: str, log_filename: str) -> str:
+        os.makedirs(log_dir, exist_ok=True)
+        return os.path.join(log_dir, log_filename)
+
+
+    @staticmethod
+    def is_error_record(record: Dict) -> bool:
+        raise NotImplementedError
+
+
+    async def fetch_roster(self, session: aiohttp.ClientSession) -> Dict[str, Dict]:
+        raise NotImplementedError
+
+
+    def scrape_players(self) -> Dict[str, Dict]:
+        raise NotImplementedError
+
+
+    def _profile_url(self, relative_url: str) -> str:
+        raise NotImplementedError
+
+
+    async def _fetch_profile(self, session: aiohttp.ClientSession, name: str, url: str, player: Dict) -> Dict:
+        """
+        The record for one roster entry: its profile, or the source's error record.
+        """
+        raise NotImplementedError
+
+
+    async def discover_players(self, session: aiohttp.ClientSession = None) -> Dict[str, Dict]:
+        """
+        The roster, keyed by profile URL. The roster pages load more players as they are
+        scrolled (which is why the browser scrolls until the count is stable), so a plain
+        GET may only see the first batch: in "auto" mode an HTTP roster that is empty, or
+        shorter than `roster_min_share` of the last run's, falls back to the browser.
+        """
+        if session is None and self.discovery_mode in ("auto", "http"):
+            async with client_session(self.scheduler.max_in_flight) as session:
+                return await self.discover_players(session)
+
+        player_data = {}
+        if self.discovery_mode in ("auto", "http"):
+            try:
+                player_data = await self.fetch_roster(session)
+            except Exception as e:
+                print("HTTP discovery failed:", e)
+
+            last_run = len(self.read_log_file(self.url_log_file_path))
+            truncated = len(player_data) < self.roster_min_share * last_run
+            if truncated and player_data:
+                print(f"HTTP discovery found {len(player_data)} players against {last_run} last run, "
+                      f"the page looks cut short")
+            if (player_data and not truncated) or self.discovery_mode == "http":
+                print("Total Players =", len(player_data))
+                self.write_log_file(self.url_log_file_path, player_data)
+                return player_data
+            print("Falling back to the browser")
+
+        loop = asyncio.get_running_loop()
+        # Run synchronous scraping in a thread
+        browser_data = await loop.run_in_executor(None, self.scrape_players)
+        if len(player_data) > len(browser_data):
+            print(f"The browser found fewer players ({len(browser_data)}), keeping the HTTP roster")
+            self.write_log_file(self.url_log_file_path, player_data)
+            return player_data
+        return browser_data
+
+
+    async def fetch_roster_page(self, session: aiohttp.ClientSession, url: str,
+                                parse: Callable[[str], Dict], timeout: float = 30) -> Dict:
+        """
+        Roster at `url` as `parse` (run in a parse worker) reads it, fetched with a plain
+        GET through the scheduler and the retry policy. Raises once it has failed for good.
+        """
+        async def fetch() -> str:
+            async with self.scheduler.slot(url):
+                async with session.get(url, headers={"User-Agent": USER_AGENT}, timeout=timeout) as response:
+                    self.scheduler.report(url, response.status, response.headers.get("Retry-After"))
+                    if response.status != 200:
+                        raise HttpStatusError(response.status, url)
+                    return await response.text()
+
+        html = await self.retry_policy.call(self.SOURCE, url, fetch)
+        return await self.parse_pool.parse(parse, html)
+
+
+    async def fetch_profile_page(self, session: aiohttp.ClientSession, url: str,
+                                 parse: Callable[[str], Dict], timeout: float = 15) -> Optional[Dict]:
+        """
+        Profile at `url` as `parse` (a module-level function, it runs in a parse worker)
+        reads it: fetched through the scheduler and the retry policy, reused from the
+        fetch cache when unchanged. None once it has failed for good.
+        """
+        headers = {"User-Agent": USER_AGENT}
+        headers.update(self.fetch_cache.conditional_headers(url))
+
+        async def fetch() -> Dict:
+            async with self.scheduler.slot(url):
+                started = time.perf_counter()
+                async with session.get(url, headers=headers, timeout=timeout) as response:
+                    self.scheduler.report(url, response.status, response.headers.get("Retry-After"))
+                    metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, source=self.SOURCE, status=response.status)
+                    if response.status == 304:
+                        html = None  # unchanged since the cached copy
+                    elif response.status != 200:
+                        raise HttpStatusError(response.status, url)
+                    else:
+                        html = await response.text()
+                        metrics.RESPONSE_BYTES.inc(response.content.total_bytes, source=self.SOURCE)
+                    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+            profile = self.fetch_cache.lookup(url, html)
+            if profile is None:
+                with metrics.PARSE_SECONDS.time(source=self.SOURCE):
+                    profile = await self.parse_pool.parse(parse, html)
+            self.fetch_cache.store(url, html, profile, etag, last_modified)
+            metrics.PROFILES.inc(source=self.SOURCE, result="ok" if html is not None else "unchanged")
+            return profile
+
+        try:
+            return await self.retry_policy.call(self.SOURCE, url, fetch)
+        except Exception as e:
+            print(f"Failed to fetch {url}: {e}")
+            metrics.PROFILES.inc(source=self.SOURCE, result="error")
+            return None
+
+
+    async def fetch_all_profiles(self, player_data: Dict[str, Dict], session: aiohttp.ClientSession = None) -> int:
+        # the batch runner passes in the session it shares between all jobs
+        if session is None:
+            async with client_session(self.scheduler.max_in_flight) as session:
+                return await self.fetch_all_profiles(player_data, session)
+
+        tasks = [
+            # URL lists saved before they were keyed by URL are keyed by name
+            self._fetch_profile(session, player.get("name", key), self._profile_url(player[self.URL_FIELD]), player)
+            for key, player in player_data.items()
+        ]
+        with self.profile_stream as stream:
+            for next_profile in asyncio.as_completed(tasks):
+                stream.write(await next_profile)
+        return stream.written
+
+
+    def write_log_file(self, path, data: Dict):
+        # write next to the target and rename, so readers never see a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        print(f"Data written to: {path}")
+
+
+    def read_log_file(self, path) -> Dict:
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable {path}: {e}")
+            return {}
+
+
+    def run(self, resume: bool = False):
+        try:
+            asyncio.run(self.run_in_app(resume=resume))
+        finally:
+            self.parse_pool.shutdown()
+
+
+    async def run_in_app(self, session: aiohttp.ClientSession = None, resume: bool = False) -> int:
+        """
+        Discover, fetch and write every profile. With `resume`, reuse the saved URL list
+        and only fetch profiles that are missing or failed in the previous run.
+        """
+        if session is None:
+            # one pool for discovery and profiles, so the profile fetches reuse its connections
+            async with client_session(self.scheduler.max_in_flight) as session:
+                return await self.run_in_app(session, resume)
+
+        player_data = self.read_log_file(self.url_log_file_path) if resume else {}
+        if player_data:
+            print(f"Resuming with {len(player_data)} players from {self.url_log_file_path}")
+        else:
+            with metrics.DISCOVERY_SECONDS.time(source=self.SOURCE):
+                player_data = await self.discover_players(session)
+        if not player_data:
+            return 0
+
+        # player_data.json follows the roster, whichever profiles this run fetches
+        order = [self._profile_url(player[self.URL_FIELD]) for player in player_data.values()]
+        if resume:
+            self.profile_stream.resume_from(self.player_data_log_file_path)
+            done = self.profile_stream.completed(self.is_error_record)
+            player_data = {
+                key: player for key, player in player_data.items()
+                if self._profile_url(player[self.URL_FIELD]) not in done
+            }
+            print(f"{len(done)} profiles already done, {len(player_data)} missing or failed")
+        else:
+            self.profile_stream.clear()
+
+        print(f"\nStarting async scraping for {len(player_data)} players...\n")
+        start = time.time()
+        fetched = await self.fetch_all_profiles(player_data, session)
+        print(f"Fetched {fetched} profiles in {time.time() - start:.2f} seconds.")
+        count = self.profile_stream.compact(self.player_data_log_file_path, self.SOURCE, self.is_error_record,
+                                            order)
+        # only now that the records are in player_data.json can their validators be reused
+        self.fetch_cache.save()
+        return count
@@ -0,0 +1,195 @@
+import json
+import os
+import textwrap
+from typing import Callable, Dict, Iterator, List, Set, Tuple
+
+from decouple import config
+
+from snapshot import open_snapshot, snapshot_path_for, write_snapshot
+
+
+# a run whose profiles failed more often than this doesn't replace the previous player_data.json
+MAX_FAILED_SHARE = config("REFRESH_MAX_FAILED_SHARE", default=0.5, cast=float)
+
+
+class TooManyFailures(Exception):
+    pass
+
+
+class ProfileStream:
+    """
+    Append-only NDJSON file profiles are written to as each fetch completes.
+
+    Every record is one line, flushed right away, so a crash loses at most the
+    profile being written and memory does not grow with the roster. `compact()`
+    turns the stream into the usual indented player_data.json list, in roster order
+    rather than the order fetches happened to complete; when a profile was written
+    more than once (e.g. retried on a later run) the last copy wins, and a profile
+    that failed keeps its last good record from the previous list.
+    """
+
+    def __init__(self, path: str, key: str = "profile_url"):
+        self.path = path
+        self.key = key
+        self.written = 0
+        self._file = None
+
+
+    def __enter__(self):
+        self.written = 0
+        needs_newline = False
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        if needs_newline:
+            # previous run died mid-line; start ours on a fresh one
+            self._file.write("\n")
+        return self
+
+
+    def __exit__(self, *exc):
+        self._file.close()
+        self._file = None
+
+
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.written += 1
+
+
+    def records(self) -> Iterator[Dict]:
+        for _, record in self._lines():
+            yield record
+
+
+    def _lines(self) -> Iterator[Tuple[int, Dict]]:
+        """
+        (byte offset, record) for every readable line of the stream.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    yield offset, json.loads(line)
+                except ValueError:
+                    pass  # blank or torn line
+                offset += len(line)
+
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+    def resume_from(self, snapshot_path: str):
+        """
+        Start the stream from the last finished run's player_data.json, so a resumed run only
+        has to append what it re-fetches. A stream left by an interrupted run is kept as is.
+        """
+        if os.path.exists(self.path) or not os.path.exists(snapshot_path):
+            return
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        with self:
+            for record in previous:
+                self.write(record)
+
+
+    def completed(self, failed: Callable[[Dict], bool]) -> Set[str]:
+        """
+        Keys whose latest record is a real profile rather than a `failed` fallback record.
+        """
+        latest = {}
+        for record in self.records():
+            if self.key in record:
+                latest[record[self.key]] = not failed(record)
+        return {key for key, ok in latest.items() if ok}
+
+
+    def _latest_lines(self, failed: Callable[[Dict], bool]) -> Dict:
+        """
+        Key -> (offset of the line holding its latest copy, whether that copy is a `failed`
+        fallback record). Records without a key are keyed by their offset.
+        """
+        latest = {}
+        for offset, record in self._lines():
+            latest[record.get(self.key, offset)] = (offset, failed(record))
+        return latest
+
+
+    def _latest_records(self, latest: Dict, previous: Dict[str, Dict], order: List) -> Iterator[Dict]:
+        # one seek per record, so the stream is never held in memory
+        with open(self.path, "rb") as f:
+            for key in order:
+                f.seek(latest[key][0])
+                record = json.loads(f.readline())
+                yield previous.get(record.get(self.key), record)
+
+
+    @staticmethod
+    def _output_order(latest: Dict, order: List[str] = None) -> List:
+        """
+        Keys in `order` (the roster), then any others sorted, so an unchanged roster is
+        written out the same way on every run.
+        """
+        position = {key: index for index, key in enumerate(order or ())}
+        return sorted(latest, key=lambda key: (position.get(key, len(position)), str(key)))
+
+
+    def _previous_good(self, output_path: str, source: str, keys: Set[str],
+                       failed: Callable[[Dict], bool]) -> Dict[str, Dict]:
+        # read from the memory-mapped snapshot, so only the records being restored are held
+        previous = {}
+        players = open_snapshot(output_path, source) if keys else []
+        if players:
+            for record in players.raw_records():
+                if record.get(self.key) in keys and not failed(record):
+                    previous[record[self.key]] = record
+        return previous
+
+
+    def compact(self, output_path: str, source: str = None, failed: Callable[[Dict], bool] = None,
+                order: List[str] = None) -> int:
+        """
+        Write the latest copy of every record to `output_path` as a JSON list (atomically),
+        plus the app's binary snapshot next to it, and empty the stream. Records are written
+        in `order` (keys in roster order), not stream order. Records that are `failed`
+        fallbacks are replaced by the previous good copy, if there is one.
+
+        Raises TooManyFailures, leaving `output_path` and the stream (for a resumed run)
+        as they were, when more than MAX_FAILED_SHARE of the profiles failed and there
+        is a previous list to keep serving. Returns the number of records written.
+        """
+        failed = failed or (lambda record: False)
+        latest = self._latest_lines(failed)
+        failed_keys = {key for key, (_, is_failed) in latest.items() if is_failed}
+        if failed_keys and os.path.exists(output_path) and len(failed_keys) > MAX_FAILED_SHARE * len(latest):
+            raise TooManyFailures(f"{len(failed_keys)} of {len(latest)} profiles failed, "
+                                  f"keeping {output_path}; run with --resume to retry them")
+        previous = self._previous_good(output_path, source, failed_keys, failed)
+        if previous:
+            print(f"Keeping the previous record of {len(previous)} profiles that failed")
+        order = self._output_order(latest, order)
+
+        tmp_path = f"{output_path}.tmp"
+        count = 0
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for record in self._latest_records(latest, previous, order):
+                f.write(",\n" if count else "\n")
+                f.write(textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), "  "))
+                count += 1
+            f.write("\n]" if count else "]")
+        os.replace(tmp_path, output_path)
+        write_snapshot(snapshot_path_for(output_path), self._latest_records(latest, previous, order), source)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        print(f"Data written to: {output_path} ({count} profiles)")
+        return count
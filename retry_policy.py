@@ -0,0 +1,187 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+import aiohttp
+from decouple import config
+
+import metrics
+
+
+T = TypeVar("T")
+
+# failure kinds, also the `failure` label of metrics.RETRIES
+TIMEOUT = "timeout"
+CONNECTION = "connection"
+HTTP_STATUS = "http_status"
+PARSE = "parse"
+
+# statuses worth asking again; anything else (403, 404, 410...) would come back the same
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class HttpStatusError(Exception):
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.url = url
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a request while the host's circuit breaker is open.
+    """
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"circuit open for {host}, next trial request in {retry_in:.0f}s")
+        self.host = host
+
+
+def classify(error: BaseException) -> Tuple[str, bool]:
+    """
+    (kind, retryable) for a failed fetch attempt. Anything that isn't a timeout, a
+    connection problem or an HTTP status went wrong while handling the response
+    (parsing it, mostly) and would fail the same way again.
+    """
+    if isinstance(error, asyncio.TimeoutError):
+        return TIMEOUT, True
+    if isinstance(error, HttpStatusError):
+        return HTTP_STATUS, error.status in RETRYABLE_STATUSES
+    if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, ConnectionError)):
+        return CONNECTION, True
+    return PARSE, False
+
+
+class CircuitBreaker:
+    """
+    One host's breaker. After `threshold` retryable failures in a row it opens and
+    every fetch fails at once for `reset_seconds`; then one trial request is let
+    through and its result closes the breaker or opens it again.
+    """
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+
+    def check(self, host: str) -> bool:
+        """
+        Raise CircuitOpenError while open; True if the caller is the trial request.
+        """
+        if self.opened_at is None:
+            return False
+        wait = self.opened_at + self.reset_seconds - time.monotonic()
+        if wait > 0 or self.trial_running:
+            raise CircuitOpenError(host, max(wait, 0))
+        self.trial_running = True
+        return True
+
+
+    def trial_cancelled(self):
+        # the trial told us nothing about the host; let the next fetch be the trial instead
+        self.trial_running = False
+
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+
+    def failure(self) -> bool:
+        """
+        Count a retryable failure; True if it opened the breaker.
+        """
+        self.failures += 1
+        trial_failed, self.trial_running = self.trial_running, False
+        if trial_failed or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+
+class RetryPolicy:
+    """
+    How profile fetches are retried, shared by every scraper of a run like FetchScheduler:
+
+    - timeouts, connection errors and 408/425/429/5xx are retried up to `attempts`
+      times in all, after an exponential backoff with full jitter
+    - other statuses and parse errors fail right away
+    - each host has a CircuitBreaker, so a host that is down fails its remaining
+      fetches at once instead of costing `attempts` requests each
+
+    A 429 or 5xx also pauses the host in the FetchScheduler (honouring Retry-After),
+    so the retry waits for that as well when it asks for a slot.
+    """
+
+    BASE_DELAY = config("RETRY_BASE_DELAY", default=0.5, cast=float)
+    MAX_DELAY = config("RETRY_MAX_DELAY", default=30.0, cast=float)
+    FAILURE_THRESHOLD = config("CIRCUIT_FAILURE_THRESHOLD", default=10, cast=int)
+    RESET_SECONDS = config("CIRCUIT_RESET_SECONDS", default=30.0, cast=float)
+
+    def __init__(self, attempts: int = None, base_delay: float = None, max_delay: float = None,
+                 failure_threshold: int = None, reset_seconds: float = None):
+        # at least one attempt, whatever RETRY_LIMIT says
+        self.attempts = max(1, attempts if attempts is not None else config("RETRY_LIMIT", cast=int))
+        self.base_delay = base_delay or self.BASE_DELAY
+        self.max_delay = max_delay or self.MAX_DELAY
+        self.failure_threshold = failure_threshold or self.FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds or self.RESET_SECONDS
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+        return self._breakers[host]
+
+
+    def backoff(self, attempt: int) -> float:
+        # anywhere up to the exponential cap, so fetches that failed together don't retry together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+    async def call(self, source: str, url: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fetch` (one attempt at `url`) until it succeeds, fails for good or the
+        host's breaker is open; the last error is raised.
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker(url)
+        for attempt in range(1, self.attempts + 1):
+            try:
+                trial = breaker.check(host)
+            except CircuitOpenError:
+                metrics.SHORT_CIRCUITED.inc(source=source)
+                raise
+            try:
+                result = await fetch()
+            except asyncio.CancelledError:
+                # e.g. a refresh shut down or a batch job timed out mid-trial
+                if trial:
+                    breaker.trial_cancelled()
+                raise
+            except Exception as e:
+                kind, retryable = classify(e)
+                if not retryable:
+                    # the host answered, it's the page that is wrong
+                    breaker.success()
+                    raise
+                if breaker.failure():
+                    metrics.CIRCUITS_OPENED.inc(host=host)
+                    print(f"{host} failed {breaker.failures} times in a row, "
+                          f"short-circuiting its fetches for {self.reset_seconds:.0f}s")
+                if attempt == self.attempts:
+                    raise
+                metrics.RETRIES.inc(source=source, failure=kind)
+                await asyncio.sleep(self.backoff(attempt))
+            else:
+                breaker.success()
+                return result
@@ -1,216 +1,264 @@
-import ssl
-# import certifi
+import re
 import requests
-import json
-import time
-import os
-import asyncio
-from typing import Dict, List
+import sys
+from typing import Dict
 
 
 import aiohttp
 from datetime import datetime
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 
 from decouple import config
 
-# to solve SSL Certificate verification error.
-# ssl_context = ssl.create_default_context(cafile=certifi.where())
-# ssl_context.load_verify_locations(certifi.where())
+from browser_pool import BrowserPool, first_element_text, wait_for_elements, wait_for_text_change
+from fetch_scheduler import FetchScheduler
+from html_parser import make_soup
+from parse_pool import ParsePool
+from profile_scraper import USER_AGENT, ProfileScraper
+from retry_policy import HttpStatusError, RetryPolicy
+
+
+# federation codes used by the athlete search API, keyed by the names shown in the site's country select
+COUNTRY_CODES = {
+    "United States": "USA",
+    "Canada": "CAN",
+    "Great Britain & N.I.": "GBR",
+    "Jamaica": "JAM",
+    "Kenya": "KEN",
+    "Ethiopia": "ETH",
+    "Australia": "AUS",
+    "France": "FRA",
+    "Germany": "GER",
+    "Japan": "JPN",
+}
+
+# the query the athlete search page itself sends to the GraphQL API
+SEARCH_COMPETITORS_QUERY = """
+query SearchCompetitors($countryCode: String) {
+  searchCompetitors(countryCode: $countryCode) {
+    aaAthleteId
+    givenName
+    familyName
+    gender
+    urlSlug
+  }
+}
+"""
+
+# containers the scraper reads; everything else on the page is skipped while parsing
+PROFILE_TARGETS = [("div", "athletesBio_athletesBioDetailsContainer__3_nDn")]
+ROSTER_TARGETS = [("table", "AthleteSearch_results__3W7HB")]
+RESULT_ROW_SELECTOR = "table.AthleteSearch_results__3W7HB td.AthleteSearch_name__2z8I1"
+
+
+def country_slug(country: str) -> str:
+    """
+    URL segment the site uses for a country, e.g. 'United States' -> 'united-states',
+    'Great Britain & N.I.' -> 'great-britain-ni'.
+    """
+    return re.sub(r"[^a-z0-9]+", "-", country.lower().replace(".", "")).strip("-")
+
+
+def calculate_age(birthdate_str: str) -> int:
+    """
+    Calculate age from a birthdate string in format: 'DD MMM YYYY' (e.g. '12 Jun 1996')
+    """
+    try:
+        birthdate = datetime.strptime(birthdate_str, "%d %b %Y")
+        today = datetime.today()
+        age = today.year - birthdate.year - ((today.month, today.day) < (birthdate.month, birthdate.day))
+        return age
+    except Exception as e:
+        print(f"Error parsing birthdate '{birthdate_str}':", e)
+        return -1  # or return None if preferred
+
+
+def parse_profile_html(html: str, backend: str = None) -> Dict:
+    """
+    Extract birthdate and athlete code from a profile page.
+    Module-level so it can run in a ParsePool worker process.
+    """
+    soup = make_soup(html, PROFILE_TARGETS, backend)
+
+    data_div = soup.find("div", class_="athletesBio_athletesBioDetailsContainer__3_nDn")
+
+    birthdate_div = data_div.contents[1]
+    date_span = birthdate_div.find("span", class_="athletesBio_athletesBioTagValue__oKZC4")
+    birthdate_text = date_span.text.strip().split(" (")[0]  # Extract only the date part
+
+    code_div = data_div.contents[2]
+    code_span = code_div.find("span", class_="athletesBio_athletesBioTagValue__oKZC4")
+    player_code = code_span.text.strip()
+
+    return {
+        "birthdate": birthdate_text,
+        "player_code": player_code,
+    }
+
+
+def parse_roster_html(html: str) -> Dict[str, Dict[str, str]]:
+    """
+    Profile slug -> athlete name, gender and slug, from the rendered athlete search table.
+    Keyed by slug so two athletes with the same name don't overwrite each other.
+    """
+    soup = make_soup(html, ROSTER_TARGETS)
+    player_data = {}
+
+    table = soup.find("table", class_="AthleteSearch_results__3W7HB")
+    table_body = table.contents[0]
+
+    for row in table_body.contents[1:]:
+        try:
+            table_div = row.find("td", class_="AthleteSearch_name__2z8I1")
+            name = table_div.a.text
+            gender = row.contents[2].text
+            href = table_div.a["href"] if table_div.a and "href" in table_div.a.attrs else ""
+            last_segment = "/" + href.rstrip("/").split("/")[-1] if href else ""
+
+            player_data[last_segment or name] = {
+                "name": name,
+                "gender": gender,
+                "profile_url": last_segment
+            }
+        except Exception as inner_e:
+                print("Error parsing in table div:", inner_e)
+    return player_data
+
+
+def parse_search_competitors(payload: Dict) -> Dict[str, Dict[str, str]]:
+    """
+    Same shape as parse_roster_html, from a searchCompetitors GraphQL response.
+    """
+    player_data = {}
+    for athlete in (payload.get("data") or {}).get("searchCompetitors") or []:
+        name = f"{athlete.get('givenName', '')} {athlete.get('familyName', '')}".strip()
+        slug = athlete.get("urlSlug") or ""
+        profile_url = "/" + slug.rstrip("/").split("/")[-1] if slug else ""
+        player_data[profile_url or name] = {
+            "name": name,
+            "gender": athlete.get("gender"),
+            "profile_url": profile_url
+        }
+    return player_data
 
-# Disable (Do not use this in production it bypasses all SSL checks)
-ssl_context = ssl._create_unverified_context()
 
+def is_error_record(record: Dict) -> bool:
+    """
+    World Athletics fallback record for a profile that could not be fetched.
+    """
+    return record.get("birthdate") == "error"
 
-class WorldAthleticsScrapper:
 
-    PLAYER_BASE_URL = config("WORLDATHLETICS_BASE_URL")
-    RETRY_LIMIT = config("RETRY_LIMIT", cast=int)
+class WorldAthleticsScrapper(ProfileScraper):
 
+    SOURCE = "worldathletics"
+    URL_FIELD = "profile_url"
+    is_error_record = staticmethod(is_error_record)
 
-    def __init__(self, country: str = None, url_log_path: str = None, data_log_path: str = None):
+
+    def __init__(self, country: str = None, url_log_path: str = None, data_log_path: str = None,
+                 scheduler: FetchScheduler = None, parse_pool: ParsePool = None,
+                 browser_pool: BrowserPool = None, retry_policy: RetryPolicy = None, country_code: str = None):
+        self.player_base_url = config("WORLDATHLETICS_BASE_URL")
+        # endpoint and key the athlete search page uses; HTTP discovery is skipped while unset
+        self.graphql_url = config("WORLDATHLETICS_GRAPHQL_URL", default="")
+        self.graphql_api_key = config("WORLDATHLETICS_GRAPHQL_API_KEY", default="")
         self.base_url = config("WORLDATHLETICS_BASE_URL")
         self.country = country or "United States"
-        self.driver = self._init_driver()
+        self.country_code = country_code or COUNTRY_CODES.get(self.country)
+        self.country_slug = country_slug(self.country)
+        super().__init__(url_log_path, data_log_path, scheduler, parse_pool, browser_pool, retry_policy)
+
 
-        self.url_log_file_path = url_log_path or self._create_log_file_path("logs_worldathletics", "player_profile_urls.json")
-        self.player_data_log_file_path = data_log_path or self._create_log_file_path("logs_worldathletics", "player_data.json")
+    def scrape_players(self):
+        player_data = {}
+        with self.browser_pool.browser() as driver:
+            try: 
+                driver.get(f"{self.base_url}")
+                wait_for_elements(driver, "#countryCode")
+                select_federation_element = driver.find_element(By.ID, "countryCode")
+                select = Select(select_federation_element)
 
+                # the table is re-rendered in place, so wait for its first row to change
+                previous_first_row = first_element_text(driver, RESULT_ROW_SELECTOR)
+                select.select_by_visible_text(self.country)
+                if not wait_for_text_change(driver, RESULT_ROW_SELECTOR, previous_first_row):
+                    print("Athlete table did not change after selecting the country, using it as is")
+                wait_for_elements(driver, RESULT_ROW_SELECTOR)
 
-    def _init_driver(self):
-        chrome_options = Options()
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        # chrome_options.add_argument("--start-fullscreen")
-        chrome_options.add_argument('--headless')  # Run Chrome in headless mode
-        chrome_options.add_argument('--disable-gpu')  # (optional) Disable GPU acceleration, recommended in headless mode
-        chrome_options.add_argument('--no-sandbox')  # (optional) Required in some Linux environments
-        chrome_options.add_argument('--window-size=1920,1080')  # Optional: set window size to avoid resolution issues
-        service = ChromeService()
-        return webdriver.Chrome(service=service, options=chrome_options)
-    
+                player_data = parse_roster_html(driver.page_source)
+                return player_data
 
-    def _create_log_file_path(self, log_dir: str, log_filename: str) -> str:
-        os.makedirs(log_dir, exist_ok=True)
-        return os.path.join(log_dir, log_filename)
-    
+            except Exception as e:
+                print("Exception occured", e)
+                driver.save_screenshot("snapshots/debug.png")
 
-    def scrape_players(self):
-        try: 
-            self.driver.get(f"{self.base_url}")
-            select_federation_element = self.driver.find_element(By.ID, "countryCode")
-            select = Select(select_federation_element)
-
-            select.select_by_visible_text(self.country)
-            time.sleep(2)
-
-            html = self.driver.page_source
-            
-            soup = BeautifulSoup(html, "html.parser")
-
-            player_data = {}
-
-            table = soup.find("table", class_="AthleteSearch_results__3W7HB")
-            table_body = table.contents[0]
-
-            for row in table_body.contents[1:]:
-                try:
-                    table_div = row.find("td", class_="AthleteSearch_name__2z8I1")
-                    name = table_div.a.text
-                    gender = row.contents[2].text
-                    href = table_div.a["href"] if table_div.a and "href" in table_div.a.attrs else ""
-                    last_segment = "/" + href.rstrip("/").split("/")[-1] if href else ""
-
-                    player_data[name] = {
-                        "gender": gender,
-                        "profile_url": last_segment
-                    }
-                except Exception as inner_e:
-                        print("Error parsing in table div:", inner_e)
-            return player_data
-
-        except Exception as e:
-            print("Exception occured", e)
-            self.driver.save_screenshot("snapshots/debug.png")
-
-        finally:
-            self.driver.quit()
-
-            print("Total Players =", len(player_data))
-            self._write_log_file(self.url_log_file_path, player_data)
-
-
-    async def _fetch_profile(
-        self, session: aiohttp.ClientSession, name: str, relative_url: str, gender: str) -> Dict:
-        url = f"{self.PLAYER_BASE_URL}/united-states{relative_url}"
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/123.0 Safari/537.36"
-            )
-        }
-        for attempt in range(1, self.RETRY_LIMIT + 1):
-            try:
-                async with session.get(url, headers=headers, timeout=60, ssl=ssl_context) as response:
-                    if response.status != 200:
-                        raise Exception(f"HTTP {response.status} for {url}")
-                    html = await response.text()
-                    soup = BeautifulSoup(html, "html.parser")
-
-                    data_div = soup.find("div", class_="athletesBio_athletesBioDetailsContainer__3_nDn")
-
-                    birthdate_div = data_div.contents[1]
-                    date_span = birthdate_div.find("span", class_="athletesBio_athletesBioTagValue__oKZC4")
-                    birthdate_text = date_span.text.strip().split(" (")[0]  # Extract only the date part
-                    age = self._calculate_age(birthdate_text)
-
-                    code_div = data_div.contents[2]
-                    code_span = code_div.find("span", class_="athletesBio_athletesBioTagValue__oKZC4")
-                    player_code = code_span.text.strip()
-
-                return {
-                    "name": name,
-                    "gender": gender,
-                    "birthdate": birthdate_text,
-                    "age": age,
-                    "player_code": player_code,
-                    "country": self.country,
-                    "profile_url": url
-                }
-
-            except Exception as e:  
-                if attempt < self.RETRY_LIMIT:
-                    await asyncio.sleep(1)
-                    continue
-                print(f"Attempt {attempt} failed for {name} ({url}): {e}")
-                return {
-                    "name": name,
-                    "gender": gender,
-                    "birthdate": "error",
-                    "player_code": "error",
-                    "profile_url": url
-                }
-    
-
-    async def fetch_all_profiles(self, player_data: Dict[str, str]) -> List[Dict]:
-        async with aiohttp.ClientSession() as session:
-            tasks = [
-                self._fetch_profile(session, name, player_data["profile_url"], player_data["gender"])
-                for name, player_data in player_data.items()
-            ]
-            return await asyncio.gather(*tasks)
-
-
-    def _write_log_file(self, path, data: List[Dict]):
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"Data written to: {path}")
-
-
-
-    def _calculate_age(self, birthdate_str: str) -> int:
+            finally:
+                if self._owns_browser_pool:
+                    self.browser_pool.close()
+
+                print("Total Players =", len(player_data))
+                self.write_log_file(self.url_log_file_path, player_data)
+
+
+    async def fetch_roster(self, session: aiohttp.ClientSession) -> Dict[str, Dict[str, str]]:
         """
-        Calculate age from a birthdate string in format: 'DD MMM YYYY' (e.g. '12 Jun 1996')
+        Ask the athlete search GraphQL API directly instead of driving the search page.
         """
-        try:
-            birthdate = datetime.strptime(birthdate_str, "%d %b %Y")
-            today = datetime.today()
-            age = today.year - birthdate.year - ((today.month, today.day) < (birthdate.month, birthdate.day))
-            return age
-        except Exception as e:
-            print(f"Error parsing birthdate '{birthdate_str}':", e)
-            return -1  # or return None if preferred
-
-
-
-    def run(self):
-        player_profile_urls = self.scrape_players()
-        if player_profile_urls:
-            print(f"\nStarting async scraping for {len(player_profile_urls)} players...\n")
-            start = time.time()
-            profiles = asyncio.run(self.fetch_all_profiles(player_profile_urls))
-            # profiles = self.fetch_all_profiles_sync(player_profile_urls)
-            print(f"Fetched all profiles in {time.time() - start:.2f} seconds.")
-            self._write_log_file(self.player_data_log_file_path, profiles)
-
-
-    async def run_in_app(self):
-        loop = asyncio.get_running_loop()
-        # Run synchronous function in a thread
-        player_profile_urls = await loop.run_in_executor(None, self.scrape_players)
-        if player_profile_urls:
-            print(f"\nStarting async scraping for {len(player_profile_urls)} players...\n")
-            start = time.time()
-            profiles = await self.fetch_all_profiles(player_profile_urls)
-            print(f"Fetched all profiles in {time.time() - start:.2f} seconds.")
-            self._write_log_file(self.player_data_log_file_path, profiles)
+        if not self.graphql_url or not self.country_code:
+            print("WorldAthletics GraphQL endpoint or country code not configured, skipping HTTP discovery")
+            return {}
+
+        headers = {"User-Agent": USER_AGENT, "Content-Type": "application/json"}
+        if self.graphql_api_key:
+            headers["x-api-key"] = self.graphql_api_key
+        body = {
+            "operationName": "SearchCompetitors",
+            "query": SEARCH_COMPETITORS_QUERY,
+            "variables": {"countryCode": self.country_code},
+        }
+
+        async def fetch() -> Dict:
+            async with self.scheduler.slot(self.graphql_url):
+                async with session.post(self.graphql_url, json=body, headers=headers, timeout=30) as response:
+                    self.scheduler.report(self.graphql_url, response.status, response.headers.get("Retry-After"))
+                    if response.status != 200:
+                        raise HttpStatusError(response.status, self.graphql_url)
+                    return await response.json(content_type=None)
+
+        payload = await self.retry_policy.call(self.SOURCE, self.graphql_url, fetch)
+        return parse_search_competitors(payload)
+
+
+    def _profile_url(self, relative_url: str) -> str:
+        return f"{self.player_base_url}/{self.country_slug}{relative_url}"
+
+
+    async def _fetch_profile(self, session: aiohttp.ClientSession, name: str, url: str, player: Dict) -> Dict:
+        profile = await self.fetch_profile_page(session, url, parse_profile_html, timeout=60)
+        if profile is None:
+            return {
+                "name": name,
+                "gender": player.get("gender"),
+                "birthdate": "error",
+                "player_code": "error",
+                "profile_url": url
+            }
+
+        return {
+            "name": name,
+            "gender": player.get("gender"),
+            "birthdate": profile.get("birthdate"),
+            # worked out on every fetch: an unchanged page reuses its parse from the fetch cache
+            "age": calculate_age(profile.get("birthdate")),
+            "player_code": profile.get("player_code"),
+            "country": self.country,
+            "profile_url": url
+        }
 
 
 if __name__ == "__main__":
     scraper = WorldAthleticsScrapper()
-    scraper.run()
+    scraper.run(resume="--resume" in sys.argv)
     # asyncio.run(scraper.run_in_app())
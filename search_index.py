@@ -0,0 +1,227 @@
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from player_store import COLUMNS
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# how alike two tokens' trigram sets must be (Dice coefficient) to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+MIN_PREFIX = 3
+# rows a segment scores for a query's rarest token, best matches first; every other token only
+# narrows them down, so a broad query ("a", a common surname) costs the same as a narrow one
+MAX_CANDIDATES = 2000
+
+# weight of a hit by field, and by how the query token matched
+FIELD_WEIGHTS = {"name": 2.0, "team": 1.0, "country": 1.0}
+EXACT, PREFIX, FUZZY = 1.0, 0.8, 0.6
+
+URL_KEYS = ("profile_url", "Profile URL", "Player Profile Link")
+
+NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text) -> List[str]:
+    """
+    Lowercase, accent-free word tokens: "Achiuwa\\xa0Précious" -> ["achiuwa", "precious"].
+    """
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return [token for token in NON_WORD.split(text) if token]
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchHit:
+
+    def __init__(self, source: str, row: int, score: float, name: str, team: str, country: str, url: str):
+        self.source = source
+        self.row = row
+        self.score = score
+        self.name = name
+        self.team = team
+        self.country = country
+        self.url = url
+
+
+class _Segment:
+    """
+    Inverted index over one source's snapshot: token -> rows, per field, plus a
+    trigram index over the vocabulary for fuzzy matching.
+    """
+
+    def __init__(self, source: str, players: Iterable[Dict]):
+        self.source = source
+        fields = {field: key for field, key in COLUMNS.get(source, {}).items() if field in FIELD_WEIGHTS}
+
+        self.rows: List[Tuple[str, str, str, str]] = []
+        postings: Dict[str, Dict[str, List[int]]] = {field: defaultdict(list) for field in fields}
+        for row, player in enumerate(players):
+            for field, key in fields.items():
+                for token in set(tokenize(player.get(key))):
+                    postings[field][token].append(row)
+            url = next((player[key] for key in URL_KEYS if player.get(key)), "")
+            self.rows.append((
+                " ".join(str(player.get(fields["name"]) or "").split()) if "name" in fields else "",
+                str(player.get(fields["team"]) or "") if "team" in fields else "",
+                str(player.get(fields["country"]) or "") if "country" in fields else "",
+                url,
+            ))
+
+        # rows are appended in order, so every posting list is already sorted
+        self.postings = {
+            field: {token: array("I", rows) for token, rows in tokens.items()}
+            for field, tokens in postings.items()
+        }
+        self.vocabulary = sorted({token for tokens in self.postings.values() for token in tokens})
+        self.trigram_index: Dict[str, List[str]] = defaultdict(list)
+        for token in self.vocabulary:
+            for gram in trigrams(token):
+                self.trigram_index[gram].append(token)
+
+
+    def _expand(self, query_token: str, fuzzy: bool = False) -> Dict[str, float]:
+        """
+        Vocabulary tokens the query token matches, with how well: exactly, as a prefix,
+        or (with `fuzzy`, and only if neither finds anything) by trigram similarity.
+        """
+        matches = {}
+        if len(query_token) >= MIN_PREFIX:
+            start = bisect.bisect_left(self.vocabulary, query_token)
+            for token in self.vocabulary[start:]:
+                if not token.startswith(query_token):
+                    break
+                matches[token] = EXACT if token == query_token else PREFIX
+        else:
+            index = bisect.bisect_left(self.vocabulary, query_token)
+            if index < len(self.vocabulary) and self.vocabulary[index] == query_token:
+                matches[query_token] = EXACT
+        if matches or not fuzzy or len(query_token) < MIN_PREFIX:
+            return matches  # two letters are too little to match fuzzily
+
+        grams = trigrams(query_token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for token in self.trigram_index.get(gram, ()):
+                shared[token] += 1
+        for token, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(token) + 1)
+            if similarity >= FUZZY_THRESHOLD:
+                matches[token] = FUZZY * similarity
+        return matches
+
+
+    def _postings(self, matches: Dict[str, float]) -> List[Tuple[float, array]]:
+        """
+        (score, rows) for every field a matched token occurs in, best score first.
+        """
+        postings = []
+        for token, quality in matches.items():
+            for field, weight in FIELD_WEIGHTS.items():
+                rows = self.postings.get(field, {}).get(token)
+                if rows:
+                    postings.append((weight * quality, rows))
+        postings.sort(key=lambda posting: -posting[0])
+        return postings
+
+
+    def search(self, query_tokens: List[str], limit: int, fuzzy: bool = False) -> List[Tuple[float, int]]:
+        """
+        The best `limit` (score, row) pairs among rows matching every query token (in any
+        field, in any order). Candidates come from the rarest token, at most MAX_CANDIDATES.
+        """
+        per_token = []
+        for query_token in query_tokens:
+            postings = self._postings(self._expand(query_token, fuzzy))
+            if not postings:
+                return []
+            per_token.append(postings)
+        per_token.sort(key=lambda postings: sum(len(rows) for _, rows in postings))
+
+        scores: Dict[int, float] = {}
+        for score, rows in per_token[0]:
+            for row in rows:
+                if len(scores) >= MAX_CANDIDATES:
+                    break
+                if row not in scores:
+                    scores[row] = score
+        for postings in per_token[1:]:
+            token_scores: Dict[int, float] = {}
+            for score, rows in postings:
+                if len(rows) > 4 * len(scores):
+                    # look the few candidates up in the sorted posting list rather than walk it
+                    for row in scores:
+                        if row not in token_scores:
+                            index = bisect.bisect_left(rows, row)
+                            if index < len(rows) and rows[index] == row:
+                                token_scores[row] = score
+                else:
+                    for row in rows:
+                        if row in scores and row not in token_scores:
+                            token_scores[row] = score
+            scores = {row: scores[row] + score for row, score in token_scores.items()}
+            if not scores:
+                return []
+        return heapq.nsmallest(limit, ((score, row) for row, score in scores.items()),
+                               key=lambda hit: (-hit[0], self.rows[hit[1]][0].lower()))
+
+
+class SearchIndex:
+    """
+    Cross-source player search. One segment per source, rebuilt from that source's
+    snapshot whenever it is (re)loaded, so a finished scrape only re-indexes its own source.
+    """
+
+    def __init__(self):
+        self._segments: Dict[str, _Segment] = {}
+        self._lock = threading.Lock()
+
+
+    def update_source(self, source: str, players: Iterable[Dict]):
+        segment = _Segment(source, players)
+        with self._lock:
+            # swap the whole segment so searches never see a half-built one
+            self._segments = {**self._segments, source: segment}
+
+
+    def __len__(self) -> int:
+        return sum(len(segment.rows) for segment in self._segments.values())
+
+
+    @staticmethod
+    def _hits(segments: Dict[str, _Segment], query_tokens: List[str], limit: int,
+              fuzzy: bool = False) -> List[Tuple[float, str, int]]:
+        return [
+            (score, source, row)
+            for source, segment in segments.items()
+            for score, row in segment.search(query_tokens, limit, fuzzy)
+        ]
+
+
+    def search(self, q: str, limit: int = DEFAULT_LIMIT) -> List[SearchHit]:
+        query_tokens = tokenize(q)
+        if not query_tokens:
+            return []
+        limit = min(max(1, limit), MAX_LIMIT)
+
+        segments = self._segments
+        hits = self._hits(segments, query_tokens, limit)
+        if len(hits) < limit:
+            # misspellings only get looked for when the words as typed don't fill the page
+            hits = self._hits(segments, query_tokens, limit, fuzzy=True)
+        best = heapq.nsmallest(limit, hits, key=lambda hit: (-hit[0], segments[hit[1]].rows[hit[2]][0].lower()))
+
+        return [
+            SearchHit(source, row, round(score, 3), *segments[source].rows[row])
+            for score, source, row in best
+        ]
@@ -0,0 +1,218 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from normalize import display_value, normalize_columns
+from player_listing import sort_orders
+
+
+# file layout (little endian, sections 8-byte aligned):
+#   header   magic, record count, length of the table of contents
+#   records  each record as compact UTF-8 JSON, back to back
+#   offsets  uint64 start of every record, plus the end of the last one
+#   columns  float64 normalized fields (height_cm, weight_kg, age, birthdate, game stats), NaN = missing
+#   orders   uint32 row numbers, ascending then descending, per scalar field
+#   toc      JSON: {"records": pos, "offsets": pos, "columns": {field: pos},
+#                   "orders": {field: [asc pos, desc pos]}}
+#   trailer  uint64 position of the toc
+MAGIC = b"PLSNAP03"
+HEADER = struct.Struct("<8sII")
+
+
+def snapshot_path_for(json_path) -> str:
+    return os.path.splitext(str(json_path))[0] + ".snap"
+
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % 8))
+
+
+def write_snapshot(path: str, records: Iterable[Dict], source: str = None) -> int:
+    """
+    Write `records` to a snapshot file (atomically). Records are streamed to disk;
+    only the scalar values needed for the sort orders are kept in memory. With a
+    `source`, its heights, weights, birthdates, ages and game stats are normalized
+    into typed columns (see normalize.py). Returns the number of records written.
+    """
+    # a temp file of its own per writer: every app worker may convert the same JSON at startup
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path), suffix=".tmp")
+    offsets = []
+    columns: Dict[str, Dict[int, object]] = {}
+    # scalars inside nested dicts ("game_stats.points"); normalized, but not sortable raw
+    nested: Dict[str, Dict[int, object]] = {}
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # the header is filled in at the end, once the sizes are known
+            f.write(b"\0" * HEADER.size)
+            records_start = f.tell()
+            for row, record in enumerate(records):
+                offsets.append(f.tell() - records_start)
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                for key, value in record.items():
+                    if value is None or isinstance(value, (str, int, float)):
+                        columns.setdefault(key, {})[row] = value
+                    elif isinstance(value, dict):
+                        for child, child_value in value.items():
+                            nested.setdefault(f"{key}.{child}", {})[row] = child_value
+            count = len(offsets)
+            offsets.append(f.tell() - records_start)
+
+            _pad(f)
+            toc = {"records": records_start, "offsets": f.tell(), "columns": {}, "orders": {}}
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+
+            raw = {key: [values.get(row) for row in range(count)] for key, values in columns.items()}
+            orders = dict(raw)
+            raw.update({key: [values.get(row) for row in range(count)] for key, values in nested.items()})
+            for field, column in normalize_columns(source, raw, count).items():
+                toc["columns"][field] = f.tell()
+                f.write(struct.pack(f"<{count}d", *column))
+                # typed values replace the raw strings for sorting, e.g. "2m06 / 6-9" sorts as 206
+                orders[field] = [None if value != value else value for value in column]
+
+            for key, values in orders.items():
+                ascending, descending = sort_orders(values)
+                toc["orders"][key] = [f.tell(), f.tell() + 4 * count]
+                f.write(struct.pack(f"<{count}I", *ascending))
+                f.write(struct.pack(f"<{count}I", *descending))
+                _pad(f)
+
+            toc_bytes = json.dumps(toc).encode("utf-8")
+            toc_pos = f.tell()
+            f.write(toc_bytes)
+            f.write(struct.pack("<Q", toc_pos))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, count, len(toc_bytes)))
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count
+
+
+class Snapshot(Sequence):
+    """
+    Read-only, memory-mapped player list.
+
+    Opening a snapshot only reads the header; a record is decoded from the mapping
+    when it is indexed, and sort orders are zero-copy views into the file, so the
+    app's startup time and resident memory don't grow with the number of players.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        # changes whenever the snapshot is rewritten; keys caches of anything derived from it
+        self.version = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+        magic, self._count, toc_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a player snapshot or was written by an older version")
+        (toc_pos,) = struct.unpack_from("<Q", self._mmap, len(self._mmap) - 8)
+        toc = json.loads(self._mmap[toc_pos:toc_pos + toc_length])
+
+        view = memoryview(self._mmap)
+        self._records_start = toc["records"]
+        self._offsets = view[toc["offsets"]:toc["offsets"] + 8 * (self._count + 1)].cast("Q")
+        self._columns = {
+            field: view[pos:pos + 8 * self._count].cast("d")
+            for field, pos in toc["columns"].items()
+        }
+        self._orders = {
+            key: (view[asc:asc + 4 * self._count].cast("I"), view[desc:desc + 4 * self._count].cast("I"))
+            for key, (asc, desc) in toc["orders"].items()
+        }
+
+
+    def __len__(self) -> int:
+        return self._count
+
+
+    def _record(self, index: int) -> Dict:
+        record = self.raw_record(index)
+        for field, column in self._columns.items():
+            value = display_value(field, column[index])
+            if value is not None:
+                record.setdefault(field, value)  # a raw key of the same name wins for display
+        return record
+
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("snapshot index out of range")
+        return self._record(index)
+
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(self._count):
+            yield self._record(index)
+
+
+    def raw_record(self, index: int) -> Dict:
+        """
+        A record exactly as it was written, without the normalized display values.
+        """
+        start = self._records_start + self._offsets[index]
+        return json.loads(self._mmap[start:self._records_start + self._offsets[index + 1]])
+
+
+    def raw_records(self) -> Iterator[Dict]:
+        for index in range(self._count):
+            yield self.raw_record(index)
+
+
+    def column(self, field: str) -> Sequence[float]:
+        """
+        Normalized float64 column (NaN = missing), one value per row; an empty
+        sequence if the source has no such field.
+        """
+        return self._columns.get(field, ())
+
+
+    def sort_order(self, key: str) -> Tuple[Sequence[int], Sequence[int]]:
+        """
+        Precomputed (ascending, descending) row orders for `key`. A field no record
+        has sorts as all-missing, i.e. in file order.
+        """
+        if key in self._orders:
+            return self._orders[key]
+        return range(self._count), range(self._count)
+
+
+def open_snapshot(json_path, source: str = None) -> Sequence:
+    """
+    Player list for a source: its snapshot if it is at least as new as the JSON file,
+    otherwise the JSON is converted once and the new snapshot opened. Returns an
+    empty list when the source has no data yet.
+    """
+    json_path = str(json_path)
+    snap_path = snapshot_path_for(json_path)
+    json_exists = os.path.exists(json_path)
+
+    if os.path.exists(snap_path) and (not json_exists or os.path.getmtime(snap_path) >= os.path.getmtime(json_path)):
+        try:
+            return Snapshot(snap_path)
+        except ValueError as e:
+            if not json_exists:
+                raise
+            print(f"Rebuilding snapshot: {e}")
+    if not json_exists:
+        return []
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        players: List[Dict] = json.load(f)
+    write_snapshot(snap_path, players, source)
+    print(f"Snapshot written to: {snap_path}")
+    return Snapshot(snap_path)
@@ -0,0 +1,84 @@
+import importlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class Source:
+    """
+    One player source as the app serves it: its page route and template, the
+    snapshot it is served from, how its list sorts and searches, and optionally
+    the scraper that refreshes it.
+
+    `scraper` is a "module:Class" string and is only imported when a scrape is
+    started, so serving snapshots never loads Selenium, aiohttp or bs4.
+    """
+
+    def __init__(self, name: str, template: str, sort_fields: Dict[str, str], search_fields: List[str],
+                 group_fields: Dict[str, str] = None, scraper: Optional[str] = None, scraper_args: Tuple = ()):
+        self.name = name
+        self.route = f"/{name}"
+        self.template = template
+        self.snapshot_path = Path(f"logs_{name}/player_data.json")
+        # public sort name -> key in the source's player dict
+        self.sort_fields = sort_fields
+        self.search_fields = search_fields
+        # public group name -> key the aggregates average by, e.g. {"team": "Team Name"}
+        self.group_fields = group_fields or {}
+        self.scraper = scraper
+        self.scraper_args = scraper_args
+
+
+    @property
+    def scrapes(self) -> bool:
+        return self.scraper is not None
+
+
+    def scraper_class(self) -> type:
+        module_name, _, class_name = self.scraper.partition(":")
+        return getattr(importlib.import_module(module_name), class_name)
+
+
+# height / weight / age sort on the normalized columns (see normalize.py)
+SOURCES: Dict[str, Source] = {source.name: source for source in [
+    Source(
+        "allrugby", "allrugby_player_list.html",
+        {"name": "name", "age": "age", "height": "height_cm", "weight": "weight_kg"},
+        ["name", "career"],
+        scraper="scraping_allrugby:AllRugbyScraper", scraper_args=("united-states",),
+    ),
+    Source(
+        "rugbypass", "rugbypass_player_list.html",
+        {"name": "name", "age": "age", "position": "position", "height": "height_cm", "weight": "weight_kg"},
+        ["name", "position"],
+        {"position": "position"},
+        scraper="scraping_rugbypass:RugbyPassScrapper", scraper_args=("usa",),
+    ),
+    Source(
+        "worldathletics", "worldathletics_player_list.html",
+        {"name": "name", "gender": "gender", "age": "age", "country": "country"},
+        ["name", "country"],
+        {"country": "country", "gender": "gender"},
+        scraper="scraping_worldathletics:WorldAthleticsScrapper",
+    ),
+    # static snapshots; nothing in this repo scrapes them
+    Source(
+        "247sports", "247sports_player_list.html",
+        {"name": "Player Name", "position": "POS", "height": "height_cm", "weight": "weight_kg", "city": "City"},
+        ["Player Name", "High School", "City"],
+        {"position": "POS"},
+    ),
+    Source(
+        "eurobasket", "eurobasket_player_list.html",
+        {"name": "Player Name", "team": "Team Name", "league": "League", "nationality": "Nationality",
+         "age": "age", "height": "height_cm", "position": "Pos"},
+        ["Player Name", "Team Name", "League", "Nationality"],
+        {"team": "Team Name", "league": "League", "nationality": "Nationality", "position": "Pos"},
+    ),
+    Source(
+        "proballers", "proballers_player_list.html",
+        {"name": "Basketball Player", "team": "Basketball Team", "age": "age", "height": "height_cm",
+         "country": "Home Country", "points": "points", "rebounds": "rebounds", "assists": "assists"},
+        ["Basketball Player", "Basketball Team", "Home Country"],
+        {"team": "Basketball Team", "country": "Home Country"},
+    ),
+]}